@@ -1,11 +1,34 @@
 import tkinter as tk
-from tkinter import ttk
+from tkinter import ttk, filedialog, simpledialog
 import json
+import os
+from classes.AutoLayout import auto_layout
+from classes.Blueprint import Blueprint
 from classes.Building import Building
+from classes.BuildingCatalog import BuildingCatalog
+from classes.CommandLog import CommandLog
+from classes.ConnectionGraph import ConnectionGraph, BELT_MARKS
+from classes.FactoryModel import FactoryModel
+from classes.FlowSolver import FlowSolver
+from classes.LayoutFile import Layout, save_layout, load_layout, PURITIES
+from classes.LogisticsSimulation import LogisticsSimulation, LOGISTICS
+from classes.PowerGrid import PowerGrid, format_mw
+from classes.ProductionPlanner import ProductionPlanner, building_input_rates
+from classes.Viewport import Viewport
+from classes.ViewTransform import ViewTransform
 from classes.ResourceSelectionDialog import ResourceSelectionDialog
+from classes.Trace import trace
+from classes.UpdateScheduler import UpdateScheduler
 
 class FactoryPlanner(tk.Tk):
     grid_size = 9
+    snap_cell_size = grid_size * 8  # Spatial index cell size for snapping points
+    world_region = (-2000, -2000, 2000, 2000)  # Scrollable area in world coordinates
+    zoom_step = 1.1  # Zoom factor per mouse-wheel notch
+    load_chunk_size = 500  # Buildings or connections materialized per event-loop turn when loading
+    shift_mask = 0x0001  # Shift bit of event.state
+    blueprint_dir = "blueprints"  # Saved blueprints, one layout file each
+    utilization_colors = ((0.5, "green"), (0.9, "gold"), (1 - 1e-6, "orange"), (float("inf"), "red"))  # (below, colour)
 
     def __init__(self):
         super().__init__()
@@ -13,44 +36,100 @@ class FactoryPlanner(tk.Tk):
         self.geometry("800x600")
 
         # Canvas with scroll region for panning
-        self.canvas = tk.Canvas(self, width=600, height=400, bg="white", scrollregion=(-2000, -2000, 2000, 2000))
+        self.canvas = tk.Canvas(self, width=600, height=400, bg="white", scrollregion=self.world_region)
         self.canvas.pack(side=tk.RIGHT, padx=10, pady=20, expand=True, fill=tk.BOTH)
 
         # Scrollbars
-        h_scrollbar = tk.Scrollbar(self, orient=tk.HORIZONTAL, command=self.canvas.xview)
+        h_scrollbar = tk.Scrollbar(self, orient=tk.HORIZONTAL, command=self.scroll_x)
         h_scrollbar.pack(side=tk.BOTTOM, fill=tk.X)
-        v_scrollbar = tk.Scrollbar(self, orient=tk.VERTICAL, command=self.canvas.yview)
+        v_scrollbar = tk.Scrollbar(self, orient=tk.VERTICAL, command=self.scroll_y)
         v_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
 
         self.canvas.config(xscrollcommand=h_scrollbar.set, yscrollcommand=v_scrollbar.set)
 
-        # Load building types from JSON file
-        with open('building_types.json', 'r') as f:
-            self.building_types = json.load(f)["buildings"]
+        # Load building types, compiled once and cached on disk until the JSON changes
+        self.catalog = BuildingCatalog.load('building_types.json')
 
         # Load solid resources from JSON file
         with open('solid_resources.json', 'r') as f:
             self.solid_resources = json.load(f)["solid_resources"]
 
+        # Items/min each building type takes in, which caps what it passes on
+        with open('recipes.json', 'r') as f:
+            self.input_rates = building_input_rates(json.load(f)["recipes"], self.catalog)
+
         # Frame for collapsible list
         self.control_frame = tk.Frame(self)
         self.control_frame.pack(side=tk.LEFT, fill=tk.Y, padx=10, pady=10)
 
+        # Power budget, red while consumers draw more than the generators produce
+        self.power_label = tk.Label(self.control_frame, anchor="w", justify=tk.LEFT)
+        self.power_label.pack(fill=tk.X)
+        self.power_text = None  # Last text shown, so unchanged totals skip the Tk call
+
+        # Outcome of the last planning or simulation run
+        self.status_label = tk.Label(self.control_frame, anchor="w", justify=tk.LEFT)
+        self.status_label.pack(fill=tk.X)
+
+        self.blueprints = {}  # name -> Blueprint
+        self.production_planner = None  # ProductionPlanner, loaded on first use
         self.create_collapsible_buttons()
 
-        self.buildings = []
-        self.connections = []  # Store connections as tuples (start_node, end_node, line_id, label_id)
-        self.connected_nodes = set()  # Track nodes that are connected
+        self.buildings = {}  # record id -> Building, in spawn order
+        self.selection = set()  # Selected buildings
+        self.clipboard = None  # Blueprint of the last copied buildings
+        self.band_start = None  # Canvas position where a rubber-band selection started
+        self.connections = ConnectionGraph()  # Belts indexed by node, building and line id
         self.selected_connection = None  # Track the selected connection
+        self.model = FactoryModel(self.snap_cell_size)  # Building geometry and snapping point positions
+        self.snap_index = self.model.snap_index
+        self.flow = FlowSolver()  # Live throughput, re-solved downstream of each edit
+        self.power = PowerGrid()  # Generation and consumption totals, kept per edit
+        self.refresh_power()
+        self.transform = ViewTransform()  # World to canvas coordinates, changed by zooming
+        self.show_utilization = False  # Colour belts by flow / capacity
+        self.viewport = Viewport(self.canvas, self.connections, self.snap_index, self.connection_label_text, self.transform, self.connection_color)
+
+        self.scheduler = UpdateScheduler(self)  # Coalesces drag redraws to one per frame
+        self.history = CommandLog()  # Undo/redo deltas
+
+        # Bound once and shared by every Building view
+        self.building_callbacks = dict(
+            deselect_all_callback=self.deselect_all,
+            node_select_callback=self.on_node_selected,
+            select_callback=self.on_building_selected,
+            move_callback=self.move_buildings,
+            on_click_callback=self.on_building_double_click
+        )
 
         self.selected_building = None
         self.selected_node = None
 
         # Bind events
-        self.canvas.bind("<ButtonPress-1>", self.on_press)  # Bind the on_press method to left mouse button press
+        self.canvas.tag_bind("belt", "<ButtonPress-1>", self.on_connection_click)
+        self.canvas.bind("<Configure>", lambda event: self.viewport.request_update())
         self.bind("<KeyPress-c>", self.connect_snapping_points)
         self.bind("<KeyPress-Delete>", self.delete_selected)
         self.bind("<KeyPress-BackSpace>", self.delete_selected)
+        self.bind("<Control-s>", self.save_factory)
+        self.bind("<Control-o>", self.open_factory)
+        self.bind("<Control-c>", self.copy_selection)
+        self.bind("<Control-v>", self.paste_clipboard)
+        self.bind("<Control-b>", self.save_blueprint)
+        self.bind("<Control-p>", self.plan_production)
+        self.bind("<Control-z>", self.undo)
+        self.bind("<Control-y>", self.redo)
+        self.bind("<Control-Z>", self.redo)  # Ctrl+Shift+Z
+        self.bind("<KeyPress-u>", self.toggle_utilization)
+        self.bind("<KeyPress-l>", self.simulate_logistics)
+        self.bind("<KeyPress-v>", self.validate_layout)
+        for tier, mk in enumerate(BELT_MARKS, start=1):
+            self.bind(f"<KeyPress-{tier}>", lambda event, mk=mk: self.set_selected_belt_tier(mk))
+
+        # Rubber-band selection on empty canvas space
+        self.canvas.bind("<ButtonPress-1>", self.start_band)
+        self.canvas.bind("<B1-Motion>", self.drag_band)
+        self.canvas.bind("<ButtonRelease-1>", self.end_band)
 
         # Panning
         self.panning_enabled = False
@@ -62,9 +141,15 @@ class FactoryPlanner(tk.Tk):
         self.canvas.bind("<B3-Motion>", self.pan_canvas)  # Use right mouse button for panning
         self.canvas.bind("<ButtonRelease-3>", self.stop_panning)
 
+        # Zooming
+        self.canvas.bind("<MouseWheel>", self.zoom_canvas)  # Windows and macOS
+        self.canvas.bind("<Button-4>", self.zoom_canvas)  # X11 wheel up
+        self.canvas.bind("<Button-5>", self.zoom_canvas)  # X11 wheel down
+
     def on_node_selected(self, building, node, node_type):
-        if node in self.connected_nodes:
-            print("Node already connected.")
+        if self.connections.is_connected(node):
+            if trace.enabled:
+                trace.emit("node.already_connected", node=node)
             return
 
         self.deselect_all()  # Ensure only one selection at a time
@@ -72,31 +157,97 @@ class FactoryPlanner(tk.Tk):
         if self.selected_node is None:
             # First node selection
             self.selected_node = (building, node, node_type)
-            self.canvas.itemconfig(node, outline="blue", width=2)  # Highlight selected node
+            self.highlight_node(node, True)  # Highlight selected node
         else:
             # Second node selection, attempt to connect
             other_building, other_node, other_type = self.selected_node
 
             if node_type != other_type and building != other_building:
-                if node not in self.connected_nodes and other_node not in self.connected_nodes:
+                if not self.connections.is_connected(node) and not self.connections.is_connected(other_node):
                     self.create_connection(other_node, node)
 
             # Reset selection
-            self.canvas.itemconfig(other_node, outline="", width=1)
+            self.highlight_node(other_node, False)
             self.selected_node = None
 
-    def on_press(self, event):
-        # Handle building selection
-        current_item = self.canvas.find_withtag("current")
-        if current_item:
-            for building in self.buildings:
-                if current_item[0] == building.rect:
-                    self.deselect_all_buildings()
-                    self.selected_building = building
-                    self.selected_node = None  # Reset selected node for new building
-                    building.select()
-                    print(f"Building {building.name} selected")
-                    return
+    def on_building_selected(self, building, event=None):
+        self.history.seal()  # A new press starts a new move entry
+        # Shift-click toggles a building; a plain click keeps a group selected so it can be dragged
+        if event is not None and event.state & self.shift_mask:
+            self.deselect_all_connections()
+            if building.selected:
+                self.selection.discard(building)
+                building.deselect()
+            else:
+                self.select_buildings((building,))
+        elif not building.selected:
+            self.deselect_all()
+            self.select_buildings((building,))
+
+        self.selected_building = building
+        self.selected_node = None  # Reset selected node for new building
+        if trace.enabled:
+            trace.emit("building.selected", name=building.name, id=building.record.id, selected=len(self.selection))
+
+    def select_buildings(self, buildings):
+        for building in buildings:
+            if building not in self.selection:
+                self.selection.add(building)
+                building.select()
+
+    def move_buildings(self, building, delta_x, delta_y):
+        # Drag the whole selection with one canvas move and one index update
+        if not building.selected:
+            building.move_by(delta_x, delta_y)
+            self.viewport.move_buildings((building,))
+            self.history.record_move((building.record.id,), delta_x, delta_y)
+            self.refresh_collisions()
+            return
+
+        scale = self.transform.scale
+        self.canvas.move("selected", delta_x * scale, delta_y * scale)
+        for selected in self.selection:
+            self.model.move_building(selected.record, delta_x, delta_y)
+        self.viewport.move_buildings(self.selection)
+        self.history.record_move(tuple(sorted(selected.record.id for selected in self.selection)), delta_x, delta_y)
+        self.refresh_collisions()
+
+    def start_band(self, event):
+        # Only presses on empty space start a rubber band; items handle their own clicks
+        if self.canvas.find_withtag("current"):
+            return
+        self.band_start = (self.canvas.canvasx(event.x), self.canvas.canvasy(event.y))
+        self.canvas.create_rectangle(*self.band_start, *self.band_start, outline="gray", dash=(4, 2), tags=("band",))
+
+    def drag_band(self, event):
+        if self.band_start is not None:
+            self.canvas.coords("band", *self.band_start, self.canvas.canvasx(event.x), self.canvas.canvasy(event.y))
+
+    def end_band(self, event):
+        if self.band_start is None:
+            return
+        self.canvas.delete("band")
+        x0, y0 = self.transform.to_world(*self.band_start)
+        x1, y1 = self.transform.to_world(self.canvas.canvasx(event.x), self.canvas.canvasy(event.y))
+        self.band_start = None
+        x0, x1 = min(x0, x1), max(x0, x1)
+        y0, y1 = min(y0, y1), max(y0, y1)
+
+        if not event.state & self.shift_mask:
+            self.deselect_all()
+        enclosed = [
+            building for building in self.viewport.buildings_in(x0, y0, x1, y1)
+            if building.x >= x0 and building.y >= y0 and building.x + building.width <= x1 and building.y + building.height <= y1
+        ]
+        self.select_buildings(enclosed)
+        if enclosed and trace.enabled:
+            trace.emit("selection.band", selected=len(self.selection))
+
+    def highlight_node(self, node, highlighted):
+        building = self.connections.building_of(node)
+        item = building.point_item(node) if building else None
+        if item is not None:
+            self.canvas.itemconfig(item, outline="blue" if highlighted else "", width=2 if highlighted else 1)
 
     def deselect_all(self):
         # Deselect all buildings and connections
@@ -104,211 +255,443 @@ class FactoryPlanner(tk.Tk):
         self.deselect_all_connections()
 
     def deselect_all_buildings(self):
-        # Deselect all buildings
-        for building in self.buildings:
+        # Only the selected buildings need their outline reset
+        for building in self.selection:
             building.deselect()
+        self.selection.clear()
         self.selected_building = None
 
     def deselect_all_connections(self):
         # Deselect all connections
         if self.selected_connection is not None:
-            line_id, label_id = self.selected_connection
-            self.canvas.itemconfig(line_id, fill="green", width=4)
-            self.selected_connection = None
+            connection, self.selected_connection = self.selected_connection, None
+            if connection.line_id is not None:
+                self.canvas.itemconfig(connection.line_id, fill=self.connection_color(connection), width=4)
 
     def delete_selected(self, event):
-        # Delete selected building or connection
+        # Delete selected buildings or connection
         if self.selected_connection is not None:
             self.delete_selected_connection()
         else:
-            self.delete_selected_building()
-
-    def delete_selected_building(self):
-        # Find and delete the selected building
-        if self.selected_building:
-            building = self.selected_building
-            self.canvas.delete(building.rect)
-            self.canvas.delete(building.label)
-            for point, _ in building.snapping_points:
-                self.canvas.delete(point)
-
-            # Remove connections related to this building
-            connections_to_remove = []
-            for start_node, end_node, line_id, label_id in self.connections:
-                if start_node in [point for point, _ in building.snapping_points] or end_node in [point for point, _ in building.snapping_points]:
-                    self.canvas.delete(line_id)
-                    self.canvas.delete(label_id)
-                    self.connected_nodes.discard(start_node)
-                    self.connected_nodes.discard(end_node)
-                    connections_to_remove.append((start_node, end_node, line_id, label_id))
-
-            # Update connections
-            for connection in connections_to_remove:
-                self.connections.remove(connection)
-
-            self.buildings.remove(building)
+            self.delete_selected_buildings()
+
+    def delete_selected_buildings(self):
+        if self.selection:
+            self.delete_buildings(list(self.selection))
+
+    def delete_buildings(self, buildings, undoable=True):
+        # Remove a batch of buildings and their belts, then erase and re-solve once
+        removed = []
+        deltas = []
+        for building in buildings:
+            deltas.append(self.building_delta(building))
+            self.model.remove_building(building.record)
+            removed.extend(self.connections.remove_building(building))
+            self.flow.remove_node(building)
+            self.power.remove_building(building.record.id)
+            del self.buildings[building.record.id]
+        self.viewport.remove_buildings(buildings, removed)
+
+        self.selection.difference_update(buildings)
+        if self.selected_building is not None and self.selected_building.record.id not in self.buildings:
             self.selected_building = None
-            print(f"Deleted {building.name}")
+        if self.selected_connection in removed:
+            self.selected_connection = None
+        if undoable:
+            self.history.record(("remove", tuple(deltas), tuple(self.connection_delta(connection) for connection in removed)))
+        self.refresh_collisions()
+
+        if trace.enabled:
+            trace.emit("buildings.deleted", buildings=len(buildings), connections=len(removed))
+        self.refresh_flow()
 
     def delete_selected_connection(self):
         # Delete the selected connection
         if self.selected_connection is not None:
-            line_id, label_id = self.selected_connection
-            for start_node, end_node, connection_line_id, connection_label_id in self.connections:
-                if connection_line_id == line_id:
-                    self.canvas.delete(connection_line_id)
-                    self.canvas.delete(connection_label_id)
-                    self.connected_nodes.discard(start_node)
-                    self.connected_nodes.discard(end_node)
-                    self.connections.remove((start_node, end_node, connection_line_id, connection_label_id))
-                    print("Deleted connection")
-                    break
+            connection = self.selected_connection
+            if self.remove_connection(connection):
+                self.history.record(("remove", (), (self.connection_delta(connection),)))
+                if trace.enabled:
+                    trace.emit("connection.deleted", start=connection.start_node, end=connection.end_node)
+                self.refresh_flow()
+            self.selected_connection = None
+
+    def remove_connection(self, connection):
+        if not self.connections.remove_connection(connection):
+            return False
+        self.viewport.erase_connection(connection)
+        self.flow.remove_edge(connection)
+        if connection is self.selected_connection:
             self.selected_connection = None
+        return True
+
+    def building_delta(self, building):
+        # Everything needed to put a removed building back under the same ids
+        record = building.record
+        return record.id, record.name, record.x, record.y, record.first_node, record.resource, record.purity
+
+    def connection_delta(self, connection):
+        return connection.start_node, connection.end_node, connection.mk
+
+    def undo(self, event=None):
+        entry = self.history.undo()
+        if entry is not None:
+            self.apply_entry(entry, reverse=True)
+
+    def redo(self, event=None):
+        entry = self.history.redo()
+        if entry is not None:
+            self.apply_entry(entry, reverse=False)
+
+    def apply_entry(self, entry, reverse):
+        # Replay one CommandLog entry forwards (redo) or backwards (undo)
+        kind = entry[0]
+        if kind == "move":
+            _, ids, delta_x, delta_y = entry
+            if reverse:
+                delta_x, delta_y = -delta_x, -delta_y
+            buildings = [self.buildings[building_id] for building_id in ids]
+            for building in buildings:
+                building.move_by(delta_x, delta_y)
+            self.viewport.move_buildings(buildings)
+            self.refresh_collisions()
+        elif kind == "miner":
+            _, building_id, old, new = entry
+            resource, purity = old if reverse else new
+            self.set_miner_output(self.buildings[building_id], resource, purity, undoable=False)
+        elif kind == "belt":
+            _, start_node, old, new = entry
+            self.set_belt_tier(self.connections.connection_for_node(start_node), old if reverse else new, undoable=False)
+        else:
+            _, buildings, connections = entry
+            if (kind == "add") != reverse:
+                self.restore_buildings(buildings, connections)
+            else:
+                self.discard_buildings(buildings, connections)
+
+    def restore_buildings(self, deltas, connections):
+        records = []
+        settings = []
+        for building_id, name, x, y, first_node, resource, purity in deltas:
+            records.append(self.model.add_building(self.catalog.get(name), x, y, building_id, first_node))
+            settings.append((resource, purity))
+        self.insert_buildings(records, settings, connections)
+
+    def discard_buildings(self, deltas, connections):
+        for start_node, _, _ in connections:
+            connection = self.connections.connection_for_node(start_node)
+            if connection is not None:
+                self.remove_connection(connection)
+        if deltas:
+            self.delete_buildings([self.buildings[delta[0]] for delta in deltas], undoable=False)
+        else:
+            self.refresh_flow()
 
     def create_collapsible_buttons(self):
-        for category, buildings in self.building_types.items():
+        for category, buildings in self.catalog.categories.items():
             # Create a frame for each category
             category_frame = ttk.LabelFrame(self.control_frame, text=category)
             category_frame.pack(fill=tk.X, pady=5)
 
             # Add buttons for each building
-            for building_name, config in buildings.items():
+            for building_name in buildings:
                 if building_name == "Miner":
-                    button = tk.Button(category_frame, text=building_name, command=lambda name=building_name, cfg=config: self.show_resource_dialog(name, cfg))
+                    button = tk.Button(category_frame, text=building_name, command=lambda name=building_name: self.show_resource_dialog(name))
                 else:
-                    button = tk.Button(category_frame, text=building_name, command=lambda name=building_name, cfg=config: self.spawn_building(name, cfg))
+                    button = tk.Button(category_frame, text=building_name, command=lambda name=building_name: self.spawn_building(name))
                 button.pack(fill=tk.X, padx=5, pady=2)
 
-    def show_resource_dialog(self, building_name, config):
+        # Saved blueprints, stamped at the centre of the view
+        self.blueprint_frame = ttk.LabelFrame(self.control_frame, text="Blueprints")
+        self.blueprint_frame.pack(fill=tk.X, pady=5)
+        tk.Button(self.blueprint_frame, text="Plan production...", command=self.plan_production).pack(fill=tk.X, padx=5, pady=2)
+        if os.path.isdir(self.blueprint_dir):
+            for file_name in sorted(os.listdir(self.blueprint_dir)):
+                name, extension = os.path.splitext(file_name)
+                if extension != ".fpl":
+                    continue
+                try:
+                    layout = load_layout(os.path.join(self.blueprint_dir, file_name), use_mmap=False)
+                except (OSError, ValueError) as error:  # E.g. left behind by a crash; the others still load
+                    if trace.enabled:
+                        trace.emit("blueprint.unreadable", file=file_name, error=str(error))
+                    continue
+                self.add_blueprint(Blueprint.from_layout(name, layout, self.catalog))
+
+    def add_blueprint(self, blueprint):
+        if blueprint.name not in self.blueprints:
+            button = tk.Button(self.blueprint_frame, text=blueprint.name, command=lambda name=blueprint.name: self.stamp_blueprint_in_view(name))
+            button.pack(fill=tk.X, padx=5, pady=2)
+        self.blueprints[blueprint.name] = blueprint
+
+    def save_blueprint(self, event=None):
+        # Keep the selected buildings and the belts between them as a named blueprint
+        if not self.selection:
+            return
+        name = simpledialog.askstring("Save blueprint", "Blueprint name:", parent=self)
+        if not name:
+            return
+        # The name becomes the file name, so it cannot leave the blueprint folder
+        name = name.strip()
+        if not name or name in (".", "..") or any(character in name for character in '/\\\0'):
+            self.status_label.config(text=f"Cannot save a blueprint named {name!r}", fg="red")
+            return
+        blueprint = Blueprint.from_layout(name, self.to_layout(self.selection), self.catalog)
+        os.makedirs(self.blueprint_dir, exist_ok=True)
+        save_layout(os.path.join(self.blueprint_dir, f"{name}.fpl"), blueprint.to_layout())
+        self.add_blueprint(blueprint)
+        if trace.enabled:
+            trace.emit("blueprint.saved", name=name, buildings=len(blueprint))
+
+    def stamp_blueprint_in_view(self, name):
+        x0, y0, x1, y1 = self.viewport.visible_region()
+        blueprint = self.blueprints[name]
+        stamped = self.stamp_blueprint(blueprint, (x0 + x1 - blueprint.width) / 2, (y0 + y1 - blueprint.height) / 2)
+        self.deselect_all()
+        self.select_buildings(stamped)
+
+    def stamp_blueprint(self, blueprint, x, y):
+        # Bulk insert a blueprint near (x, y), keeping its buildings on the same grid offsets
+        x = blueprint.origin_x + round((x - blueprint.origin_x) / self.grid_size) * self.grid_size
+        y = blueprint.origin_y + round((y - blueprint.origin_y) / self.grid_size) * self.grid_size
+        records, first_node = self.model.add_blueprint(blueprint, x, y)
+        settings = [(resource, purity) for _, _, _, resource, purity in blueprint.placements]
+        connections = [(first_node + start, first_node + end, mk) for start, end, mk in blueprint.connections]
+        paths = {index: tuple((x + dx, y + dy) for dx, dy in route) for index, route in blueprint.routes.items()}
+        buildings = self.insert_buildings(records, settings, connections, paths)
+
+        self.history.record(("add", tuple(self.building_delta(building) for building in buildings), tuple(connections)))
+        if trace.enabled:
+            trace.emit("blueprint.stamped", name=blueprint.name, buildings=len(buildings), connections=len(connections))
+        return buildings
+
+    def insert_buildings(self, records, settings, connections, paths=None, refresh=True):
+        # Views, graph entries and flow nodes for records already placed in the model, plus the
+        # belts between them (routed through paths[index] when given), drawn in one viewport
+        # pass and re-solved once
+        buildings = []
+        for record, (resource, purity) in zip(records, settings):
+            building = self.make_building(record)
+            self.buildings[record.id] = building
+            self.connections.add_building(building, building.snapping_points)
+            self.flow.add_node(building, capacity=self.input_rates.get(record.name))
+            self.power.add_building(record.id, self.catalog.get(record.name))
+            if resource is not None:
+                self.set_miner_output(building, resource, purity, refresh=False, undoable=False)
+            buildings.append(building)
+
+        self.insert_connections(connections, paths)
+        self.viewport.add_buildings(buildings)  # Also draws the new belts of the shown ones
+        self.refresh_collisions()
+        if refresh:
+            self.refresh_flow()
+        return buildings
+
+    def insert_connections(self, connections, paths=None, draw=True):
+        # Graph entries and flow edges for (start node, end node, mk) belts, without events or a
+        # re-solve. With draw=False the caller draws the shown ones, e.g. in one pass per batch.
+        for index, (start_node, end_node, mk) in enumerate(connections):
+            connection = self.connections.add_connection(start_node, end_node, mk)
+            if paths and index in paths:
+                connection.path = paths[index]
+            self.flow.add_edge(connection, *self.connections.endpoints(connection), connection.capacity)
+            if draw:
+                self.viewport.add_connection(connection)  # Belts to buildings already in view
+
+    def plan_production(self, event=None):
+        # Plan a production chain for one item and place it, with routed belts, in the middle of the view
+        if self.production_planner is None:
+            self.production_planner = ProductionPlanner.from_files()
+        item = simpledialog.askstring("Plan production", "Item to produce:", parent=self)
+        if not item:
+            return
+        if item not in self.production_planner.producer:
+            if trace.enabled:
+                trace.emit("plan.no_recipe", item=item)
+            return
+        rate = simpledialog.askfloat("Plan production", f"{item} per minute:", parent=self, minvalue=0.1)
+        if not rate:
+            return
+
+        plan = self.production_planner.plan({item: rate})
+        layout, routes, unfed = auto_layout(plan, self.production_planner.recipes, self.production_planner.solid_resources, self.catalog, self.grid_size)
+        self.add_blueprint(Blueprint.from_layout(f"{item} {rate:g}/min", layout, self.catalog, routes))
+        self.stamp_blueprint_in_view(f"{item} {rate:g}/min")
+        if trace.enabled:
+            trace.emit("plan.placed", item=item, rate=rate, buildings=len(layout), belts=layout.connection_count(),
+                       unrouted=layout.connection_count() - len(routes), unfed=unfed)
+        text = f"{item} {rate:g}/min: {len(layout)} buildings, {layout.connection_count()} belts"
+        if unfed:
+            text += f"\n{unfed} inputs without a belt"
+        self.status_label.config(text=text, fg="red" if unfed else "black")
+
+    def show_resource_dialog(self, building_name):
         # Open the resource selection dialog for Miner
-        dialog = ResourceSelectionDialog(self, self.solid_resources, lambda resource, purity: self.create_miner(building_name, config, resource, purity))
+        dialog = ResourceSelectionDialog(self, self.solid_resources, lambda resource, purity: self.create_miner(building_name, resource, purity))
 
-    def create_miner(self, building_name, config, resource, purity):
+    def create_miner(self, building_name, resource, purity):
         # Create a miner with the selected resource and purity
-        miner = self.spawn_building(building_name, config)
-        self.set_miner_output(miner, resource, purity)
+        miner = self.spawn_building(building_name, undoable=False)
+        self.set_miner_output(miner, resource, purity, undoable=False)
+        self.history.record(("add", (self.building_delta(miner),), ()))
+
+    def on_building_double_click(self, building):
+        # Change the resource of an existing miner
+        if building.name == "Miner":
+            ResourceSelectionDialog(self, self.solid_resources, lambda resource, purity: self.set_miner_output(building, resource, purity))
+
+    def spawn_building(self, building_name, x=100, y=100, undoable=True):
+        # Spawn a building from its precompiled catalog entry
+        record = self.model.add_building(self.catalog.get(building_name), x, y)
+        building = self.make_building(record)
+        self.buildings[record.id] = building
+        self.connections.add_building(building, building.snapping_points)
+        self.viewport.add_building(building)
+        self.flow.add_node(building, supply=building.output_rate, capacity=self.input_rates.get(building_name))
+        self.power.add_building(record.id, self.catalog.get(building_name))
+        self.refresh_power()
+        self.refresh_collisions()
+        if undoable:
+            self.history.record(("add", (self.building_delta(building),), ()))
+        if trace.enabled:
+            trace.emit("building.spawned", name=building_name, id=record.id)
+        return building
 
-    def spawn_building(self, building_name, config):
-        # Spawn a building based on its configuration
-        building = Building(
+    def make_building(self, record):
+        return Building(
             self.canvas,
-            x=100,
-            y=100,
-            name=building_name,
-            config=config,
+            record,
             grid_size=self.grid_size,
-            deselect_all_callback=self.deselect_all,
-            node_select_callback=self.on_node_selected,
-            update_connections_callback=self.update_connections
+            model=self.model,
+            transform=self.transform,
+            scheduler=self.scheduler,
+            **self.building_callbacks
         )
-        self.buildings.append(building)
-        print(f"Spawned {building_name}")
-        return building
 
     def connect_snapping_points(self, event):
         if self.selected_building is None:
             return
 
-        # Get mouse position
-        mouse_x = self.canvas.canvasx(event.x)
-        mouse_y = self.canvas.canvasy(event.y)
+        # Get mouse position in world coordinates
+        mouse_x, mouse_y = self.transform.to_world(self.canvas.canvasx(event.x), self.canvas.canvasy(event.y))
 
-        # Find the closest snapping point from the hovered building
-        closest_building, closest_node, min_distance = None, None, float('inf')
+        if self.selected_node is None:
+            # Pick a free node on the selected building first
+            self.try_create_connection(None, None)
+            return
 
-        for building in self.buildings:
-            if building != self.selected_building:
-                for point, point_type in building.snapping_points:
-                    # Calculate the distance from mouse position to the snapping point
-                    x0, y0, x1, y1 = self.canvas.coords(point)
-                    point_x, point_y = (x0 + x1) / 2, (y0 + y1) / 2
-                    distance = ((mouse_x - point_x) ** 2 + (mouse_y - point_y) ** 2) ** 0.5
+        # Find the closest free snapping point of the opposite type on another building
+        _, start_type = self.selected_node[-2:]
+        wanted_type = "input" if start_type == "output" else "output"
 
-                    if distance < min_distance:
-                        min_distance = distance
-                        closest_building = building
-                        closest_node = (point, point_type)
+        def accept(point, data):
+            building, point_type = data
+            return building is not self.selected_building.record and point_type == wanted_type and not self.connections.is_connected(point)
 
-        if closest_node:
-            self.try_create_connection(self.selected_node, closest_node)
+        closest = self.snap_index.nearest(mouse_x, mouse_y, accept)
+        if closest:
+            point, (_, point_type), _ = closest
+            self.try_create_connection(self.selected_node, (point, point_type))
 
     def try_create_connection(self, selected_node, closest_node):
         if self.selected_node is None:
             # Select a node from the selected building
             for point, point_type in self.selected_building.snapping_points:
-                if point not in self.connected_nodes and point_type in ("output", "input"):
+                if not self.connections.is_connected(point) and point_type in ("output", "input"):
                     self.selected_node = (point, point_type)
-                    self.canvas.itemconfig(point, outline="blue", width=2)
+                    self.highlight_node(point, True)
                     break
             return
 
         # Check connection validity
-        start_node, start_type = self.selected_node
+        start_node, start_type = self.selected_node[-2:]
         end_node, end_type = closest_node
 
         if (start_type == "output" and end_type == "input") or (start_type == "input" and end_type == "output"):
             self.create_connection(start_node, end_node)
 
         # Reset selection
-        self.canvas.itemconfig(start_node, outline="", width=1)
+        self.highlight_node(start_node, False)
         self.selected_node = None
 
-    def create_connection(self, start_node, end_node, mk="I"):
-        x0, y0, _, _ = self.canvas.coords(start_node)
-        x1, y1, _, _ = self.canvas.coords(end_node)
-
-        # Draw line between two snapping points with increased thickness
-        connection_line = self.canvas.create_line(x0, y0, x1, y1, fill="green", width=4)
-
-        # Create a label for the mk
-        mid_x, mid_y = (x0 + x1) / 2, (y0 + y1) / 2
-        mk_label = self.canvas.create_text(mid_x, mid_y, text=f"{mk}", fill="black")
-
-        self.connections.append((start_node, end_node, connection_line, mk_label))
-
-        # Bind events for selecting the connection
-        self.canvas.tag_bind(connection_line, "<ButtonPress-1>", self.on_connection_click)
-
-        # Mark nodes as connected
-        self.connected_nodes.add(start_node)
-        self.connected_nodes.add(end_node)
-
-        print("Connection created")
+    def create_connection(self, start_node, end_node, mk="I", refresh=True, undoable=True):
+        connection = self.connections.add_connection(start_node, end_node, mk)
+        source, target = self.connections.endpoints(connection)
+        self.flow.add_edge(connection, source, target, connection.capacity)
+
+        # Draw it if it is in view; clicks reach on_connection_click through the "belt" tag
+        self.viewport.add_connection(connection)
+        if undoable:
+            self.history.record(("add", (), (self.connection_delta(connection),)))
+
+        if trace.enabled:
+            trace.emit("connection.created", start=start_node, end=end_node, mk=mk)
+        if refresh:
+            self.refresh_flow()
+
+    def copy_selection(self, event=None):
+        if self.selection:
+            self.clipboard = Blueprint.from_layout("Clipboard", self.to_layout(self.selection), self.catalog)
+            if trace.enabled:
+                trace.emit("selection.copied", buildings=len(self.clipboard))
+
+    def paste_clipboard(self, event=None):
+        # Paste the copied buildings with their top-left corner at the mouse pointer
+        if self.clipboard is None or not len(self.clipboard):
+            return
+        pointer_x = self.canvas.canvasx(self.canvas.winfo_pointerx() - self.canvas.winfo_rootx())
+        pointer_y = self.canvas.canvasy(self.canvas.winfo_pointery() - self.canvas.winfo_rooty())
+        pasted = self.stamp_blueprint(self.clipboard, *self.transform.to_world(pointer_x, pointer_y))
+        self.deselect_all()
+        self.select_buildings(pasted)
 
     def on_connection_click(self, event):
         # Select a connection line
         self.deselect_all()  # Ensure only one selection at a time
         line_id = self.canvas.find_withtag("current")[0]
-        # Find the corresponding label
-        label_id = next((label for _, _, line, label in self.connections if line == line_id), None)
-        self.selected_connection = (line_id, label_id)
+        # Find the corresponding connection
+        self.selected_connection = self.connections.connection_for_line(line_id)
+        if self.selected_connection is None:
+            return
         self.canvas.itemconfig(line_id, fill="yellow", width=4)  # Highlight selected connection
-        print("Connection selected")
-
-    def update_connections(self, building):
-        # Update connections for a given building
-        valid_connections = []
-        for start_node, end_node, line_id, label_id in self.connections:
-            # Check if nodes are still valid
-            if self.canvas.coords(start_node) and self.canvas.coords(end_node):
-                x0, y0, _, _ = self.canvas.coords(start_node)
-                x1, y1, _, _ = self.canvas.coords(end_node)
-                self.canvas.coords(line_id, x0, y0, x1, y1)
-                
-                # Update the label position
-                mid_x, mid_y = (x0 + x1) / 2, (y0 + y1) / 2
-                self.canvas.coords(label_id, mid_x, mid_y)
-                
-                valid_connections.append((start_node, end_node, line_id, label_id))
-            else:
-                # Remove connection if any node is invalid
-                self.canvas.delete(line_id)
-                self.canvas.delete(label_id)
-                self.connected_nodes.discard(start_node)
-                self.connected_nodes.discard(end_node)
-        
-        # Update the list of valid connections
-        self.connections = valid_connections
+        if trace.enabled:
+            trace.emit("connection.selected", start=self.selected_connection.start_node, end=self.selected_connection.end_node)
+
+    def set_selected_belt_tier(self, mk):
+        if self.selected_connection is not None:
+            self.set_belt_tier(self.selected_connection, mk)
+
+    def set_belt_tier(self, connection, mk, undoable=True):
+        # Change a belt's mark; its capacity limits the flow solved through it
+        old = connection.mk
+        if old == mk:
+            return
+        connection.mk = mk
+        self.flow.set_edge_capacity(connection, connection.capacity)
+        if undoable:
+            self.history.record(("belt", connection.start_node, old, mk))
+        self.refresh_flow()
+
+        # Utilization changes even when the flow on the belt does not
+        self.update_connection_labels((connection,))
+        self.viewport.recolor((connection,))
+
+    def refresh_collisions(self):
+        # Recolour only the buildings that started or stopped overlapping since the last edit
+        collisions = self.model.collisions
+        for building_id in collisions.take_changed():
+            building = self.buildings.get(building_id)
+            if building is not None:
+                building.set_colliding(collisions.is_colliding(building_id))
+
+    def validate_layout(self, event=None):
+        # Check the whole layout for overlapping buildings from scratch and select them
+        pairs = self.model.overlaps()
+        self.deselect_all()
+        self.select_buildings({self.buildings[record.id] for pair in pairs for record in pair})
+        if trace.enabled:
+            trace.emit("layout.validated", overlapping_pairs=len(pairs), selected=len(self.selection))
+        return pairs
 
     def enable_panning(self, event):
         self.panning_enabled = True
@@ -323,19 +706,247 @@ class FactoryPlanner(tk.Tk):
     def pan_canvas(self, event):
         if self.panning_enabled:
             self.canvas.scan_dragto(event.x, event.y, gain=1)
+            self.viewport.request_update()
+
+    def zoom_canvas(self, event):
+        # Zoom around the mouse pointer with a single tag-wide canvas.scale call
+        zoom_in = event.num == 4 or getattr(event, "delta", 0) > 0
+        factor = self.transform.clamp_factor(self.zoom_step if zoom_in else 1 / self.zoom_step)
+        if factor == 1:
+            return
+
+        center_x, center_y = self.canvas.canvasx(event.x), self.canvas.canvasy(event.y)
+        self.canvas.scale("all", center_x, center_y, factor, factor)
+        self.transform.zoom(factor, center_x, center_y)
+
+        # Keep the scrollable area covering the same world region
+        x0, y0 = self.transform.to_canvas(*self.world_region[:2])
+        x1, y1 = self.transform.to_canvas(*self.world_region[2:])
+        self.canvas.config(scrollregion=(x0, y0, x1, y1))
+        self.viewport.request_update()
+
+    def scroll_x(self, *args):
+        self.canvas.xview(*args)
+        self.viewport.request_update()
+
+    def scroll_y(self, *args):
+        self.canvas.yview(*args)
+        self.viewport.request_update()
 
     def stop_panning(self, event):
         pass  # No action needed here
 
-    def set_miner_output(self, miner, resource, purity):
+    def set_miner_output(self, miner, resource, purity, refresh=True, undoable=True):
         # Retrieve the production rate for the selected resource and purity
         resource_info = self.solid_resources.get(resource)
         if not resource_info:
             return
+        # The purity box is editable, so accept any case and ignore anything else
+        purity = (purity or "").strip().capitalize()
+        if purity not in PURITIES[1:]:
+            return
+        if undoable:
+            self.history.record(("miner", miner.record.id, (miner.resource, miner.purity), (resource, purity)))
 
         # Determine the production rate based on purity
         rate_key = f"{purity.lower()}_rate"
         production_rate = resource_info.get(rate_key, 0)
 
         # Update the label on the miner
+        miner.output_rate = production_rate
+        miner.resource = resource
+        miner.purity = purity
         miner.update_output_label(f"{resource} ({purity}): {production_rate}/min")
+        self.flow.set_node_rates(miner, supply=production_rate)
+        if refresh:
+            self.refresh_flow()
+
+    def refresh_flow(self):
+        # Re-solve only downstream of the edits made since the last refresh
+        stats = self.flow.update()
+        self.update_connection_labels(stats.changed_edges)
+        if self.show_utilization:
+            self.viewport.recolor(stats.changed_edges)
+        for building in stats.changed_nodes:
+            self.power.set_fuel_input(building.record.id, self.flow.result.inflow.get(building, 0.0))
+        self.refresh_power()
+        if trace.enabled:
+            trace.emit("flow.updated", nodes=stats.nodes, changed_edges=len(stats.changed_edges), unsettled=len(self.flow.result.unsettled), elapsed=stats.elapsed)
+        return stats
+
+    def refresh_power(self):
+        power = self.power
+        text = f"Power: {format_mw(power.generation)} / {format_mw(power.capacity)} MW\nUsed: {format_mw(power.consumption)} MW"
+        if power.starved:
+            text += f"\n{len(power.starved)} generators short of fuel"
+        if text != self.power_text:
+            self.power_text = text
+            self.power_label.config(text=text, fg="red" if power.deficit else "black")
+
+    def simulate_logistics(self, event=None):
+        # Run splitters and mergers forward in time until their split settles or belts back up
+        kinds = {building: building.name for building in self.buildings.values()}
+        demands = {building: self.input_rates.get(building.name) for building in self.buildings.values()}
+        result = LogisticsSimulation.from_flow(self.flow, kinds, demands).run()
+        text = f"Logistics {'steady' if result.steady else 'not steady'} after {result.minutes:.2g} min"
+        if result.saturated_at:
+            text += f"\n{len(result.saturated_at)} belts backed up"
+        if result.blocked:
+            text += f"\n{len(result.blocked)} buildings blocked, {round(sum(result.blocked.values()), 2):g}/min held back"
+        self.status_label.config(text=text, fg="red" if result.blocked else "black")
+        if not trace.enabled:
+            return result
+        trace.emit("logistics.simulated", steady=result.steady, minutes=result.minutes, saturated=len(result.saturated_at))
+        for building in self.buildings.values():
+            if building.name in LOGISTICS and building in self.flow.nodes:
+                outputs = self.flow.nodes[building].out_edges
+                trace.emit("logistics.balancer", name=building.name, id=building.record.id, rate=result.node_rates[building],
+                           outputs=[result.belt_rates.get(edge, 0.0) for edge in outputs])
+        for building, rate in result.blocked.items():
+            trace.emit("logistics.blocked", name=building.name, id=building.record.id, rate=rate)
+        return result
+
+    def connection_label_text(self, connection):
+        rate = self.flow.result.belt_flow.get(connection)
+        if rate is None:
+            return f"{connection.mk}"
+        edge = self.flow.edges.get(connection)
+        if edge is not None and edge.source in self.flow.result.unsettled:
+            return f"{connection.mk}: unbounded loop"
+        return f"{connection.mk}: {round(rate, 2):g}/{connection.capacity}/min"
+
+    def connection_color(self, connection):
+        if connection is self.selected_connection:
+            return "yellow"
+        if not self.show_utilization or not connection.capacity:
+            return "green"
+        utilization = self.flow.result.belt_flow.get(connection, 0.0) / connection.capacity
+        for limit, color in self.utilization_colors:
+            if utilization < limit:
+                return color
+
+    def toggle_utilization(self, event=None):
+        # Switch between plain belts and the utilization heatmap, recolouring what is drawn
+        self.show_utilization = not self.show_utilization
+        self.viewport.recolor(self.viewport.drawn)
+
+    def update_connection_labels(self, connections):
+        # Only belts currently drawn with a label need their text refreshed
+        for connection in connections:
+            if connection.label_id is not None:
+                self.canvas.itemconfig(connection.label_id, text=self.connection_label_text(connection))
+
+    def clear_factory(self):
+        # Remove every building and belt
+        self.canvas.delete("all")
+        self.buildings = {}
+        self.selection = set()
+        self.band_start = None
+        self.connections = ConnectionGraph()
+        self.model = FactoryModel(self.snap_cell_size)
+        self.snap_index = self.model.snap_index
+        self.flow = FlowSolver()
+        self.power = PowerGrid()
+        self.refresh_power()
+        self.transform = ViewTransform()
+        self.history.clear()
+        self.canvas.config(scrollregion=self.world_region)
+        self.viewport = Viewport(self.canvas, self.connections, self.snap_index, self.connection_label_text, self.transform, self.connection_color)
+        self.selected_building = None
+        self.selected_connection = None
+        self.selected_node = None
+
+    def to_layout(self, buildings=None):
+        # Columnar snapshot of the current factory, or of some buildings and the belts between them
+        if buildings is None:
+            buildings = self.buildings.values()
+            connections = self.connections
+        else:
+            connections = {}
+            for building in buildings:
+                connections.update(dict.fromkeys(self.connections.connections_for_building(building)))
+
+        layout = Layout()
+        ports = {}
+        for index, building in enumerate(buildings):
+            layout.add_building(building.name, building.x, building.y, building.resource, building.purity)
+            for port, (point, _) in enumerate(building.snapping_points):
+                ports[point] = (index, port)
+        for connection in connections:
+            if connection.start_node not in ports or connection.end_node not in ports:
+                continue
+            start_building, start_port = ports[connection.start_node]
+            end_building, end_port = ports[connection.end_node]
+            layout.add_connection(start_building, start_port, end_building, end_port, connection.mk)
+        return layout
+
+    def save_factory(self, event=None):
+        path = filedialog.asksaveasfilename(defaultextension=".fpl", filetypes=[("Factory layout", "*.fpl")])
+        if path:
+            save_layout(path, self.to_layout())
+            if trace.enabled:
+                trace.emit("layout.saved", path=path, buildings=len(self.buildings), connections=len(self.connections))
+
+    def open_factory(self, event=None):
+        path = filedialog.askopenfilename(filetypes=[("Factory layout", "*.fpl")])
+        if path:
+            self.load_factory(load_layout(path))
+
+    def load_factory(self, layout):
+        # Replace the factory with a layout, materializing it a chunk per event-loop turn
+        self.clear_factory()
+        self.after_idle(self.load_buildings_chunk, layout, 0, [])
+
+    def load_buildings_chunk(self, layout, start, spawned):
+        end = min(start + self.load_chunk_size, len(layout))
+        self.add_layout_buildings(layout, start, end, spawned)
+
+        if end < len(layout):
+            self.after(1, self.load_buildings_chunk, layout, end, spawned)
+        else:
+            self.after(1, self.load_connections_chunk, layout, 0, spawned)
+
+    def load_connections_chunk(self, layout, start, spawned):
+        end = min(start + self.load_chunk_size, layout.connection_count())
+        self.add_layout_connections(layout, start, end, spawned)
+
+        if end < layout.connection_count():
+            self.after(1, self.load_connections_chunk, layout, end, spawned)
+        else:
+            self.refresh_flow()
+            if trace.enabled:
+                trace.emit("layout.loaded", buildings=len(self.buildings), connections=len(self.connections))
+
+    def add_layout_buildings(self, layout, start, end, spawned):
+        # Place layout buildings start..end-1 in the model and insert them as one batch; spawned
+        # collects their records by layout index, None for unknown types
+        placements = []
+        settings = []
+        known = []  # Position in spawned of each placement
+        for index in range(start, end):
+            name, x, y, resource, purity = layout.building(index)
+            building_type = self.catalog.get(name)
+            if building_type is None:
+                if trace.enabled:
+                    trace.emit("layout.unknown_type", name=name, index=index)
+                spawned.append(None)
+                continue
+            placements.append((building_type, x, y))
+            settings.append((resource, purity))
+            known.append(len(spawned))
+            spawned.append(None)
+        records = self.model.add_buildings(placements)
+        for position, record in zip(known, records):
+            spawned[position] = record
+        self.insert_buildings(records, settings, (), refresh=False)
+
+    def add_layout_connections(self, layout, start, end, spawned):
+        # Recreate layout connections start..end-1 between buildings already added from the same layout
+        connections = []
+        for index in range(start, end):
+            start_building, start_port, end_building, end_port, mk = layout.connection(index)
+            if spawned[start_building] is None or spawned[end_building] is None:
+                continue
+            connections.append((spawned[start_building].first_node + start_port, spawned[end_building].first_node + end_port, mk))
+        self.insert_connections(connections, draw=False)
+        self.viewport.draw_shown_connections()
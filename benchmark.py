@@ -0,0 +1,244 @@
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+from classes.BuildingCatalog import BuildingCatalog
+from classes.ConnectionGraph import ConnectionGraph
+from classes.FactoryModel import FactoryModel
+from classes.FlowSolver import FlowSolver
+from classes.LayoutFile import Layout, save_layout, load_layout
+from classes.ProductionPlanner import building_input_rates
+from classes.Trace import trace, TimingHook
+
+# Times the planner's hot paths on synthetic factories: spawning, dragging with belt endpoint
+# updates, nearest snapping point lookups, deleting, saving and loading, flow solving and the
+# overlap check. The default run is headless and uses the Tk-free model classes; --tk drives
+# a withdrawn FactoryPlanner instead (it needs a display, e.g. xvfb-run). Timings are
+# collected through the trace hooks, so the planner's own events are counted as well.
+
+SPACING = 240  # World units between building origins, more than the largest building
+GRID_SIZE = 9
+SNAP_CELL_SIZE = GRID_SIZE * 8  # Same as the planner
+
+
+def synthetic_layout(catalog, buildings, belts, seed=0):
+    # Random building types on a square grid, with belts from outputs to inputs of buildings a
+    # little further along, so the belt graph is acyclic like a production chain. Fewer belts
+    # than asked for are made when the buildings run out of free ports.
+    rng = random.Random(seed)
+    types = [building_type for building_type in catalog if building_type.ports]
+    columns = max(1, math.ceil(math.sqrt(buildings)))
+    layout = Layout()
+    free_outputs = []  # building index -> free output ports
+    free_inputs = []
+    for index in range(buildings):
+        building_type = rng.choice(types)
+        resource, purity = ("Iron Ore", "Normal") if building_type.name == "Miner" else (None, None)
+        layout.add_building(building_type.name, (index % columns) * SPACING, (index // columns) * SPACING, resource, purity)
+        free_outputs.append([port for port, (_, _, port_type) in enumerate(building_type.ports) if port_type == "output"])
+        free_inputs.append([port for port, (_, _, port_type) in enumerate(building_type.ports) if port_type == "input"])
+
+    made = 0
+    progress = True
+    while made < belts and progress:
+        progress = False
+        for start in range(buildings):
+            if made >= belts:
+                break
+            if not free_outputs[start]:
+                continue
+            end = start + rng.randint(1, 20)
+            if end >= buildings or not free_inputs[end]:
+                continue
+            layout.add_connection(start, free_outputs[start].pop(), end, free_inputs[end].pop())
+            made += 1
+            progress = True
+    return layout
+
+
+def build_model(layout, catalog):
+    model = FactoryModel(SNAP_CELL_SIZE)
+    graph = ConnectionGraph()
+    placements = []
+    for index in range(len(layout)):
+        name, x, y, _, _ = layout.building(index)
+        placements.append((catalog.get(name), x, y))
+    records = model.add_buildings(placements)  # In bulk, as the planner loads layouts
+    for record in records:
+        graph.add_building(record, record.snapping_points())
+    for index in range(layout.connection_count()):
+        start_building, start_port, end_building, end_port, mk = layout.connection(index)
+        graph.add_connection(records[start_building].first_node + start_port, records[end_building].first_node + end_port, mk)
+    return model, graph, records
+
+
+def build_flow(layout, solid_resources, input_rates):
+    flow = FlowSolver()
+    for index in range(len(layout)):
+        name, _, _, resource, purity = layout.building(index)
+        supply = solid_resources.get(resource, {}).get(f"{purity.lower()}_rate", 0) if resource else 0.0
+        flow.add_node(index, supply=supply, capacity=input_rates.get(name))
+    for index in range(layout.connection_count()):
+        start_building, _, end_building, _, _ = layout.connection(index)
+        flow.add_edge(index, start_building, end_building, 60)
+    return flow
+
+
+def run_headless(layout, catalog, solid_resources, input_rates, rng, frames, queries):
+    with trace.span("bench.spawn", buildings=len(layout), connections=layout.connection_count()):
+        model, graph, records = build_model(layout, catalog)
+
+    # A dragged group moves its records, snapping points and footprints, then recomputes the
+    # endpoints of every belt attached to it, as Viewport.move_buildings does
+    group = rng.sample(records, min(50, len(records)))
+    with trace.span("bench.drag", buildings=len(group), frames=frames):
+        for _ in range(frames):
+            for record in group:
+                model.move_building(record, 3, 1)
+            seen = set()
+            for record in group:
+                for connection in graph.connections_for_building(record):
+                    if connection not in seen:
+                        seen.add(connection)
+                        model.snap_index.position(connection.start_node)
+                        model.snap_index.position(connection.end_node)
+
+    extent = math.ceil(math.sqrt(len(records))) * SPACING
+    points = [(rng.uniform(0, extent), rng.uniform(0, extent)) for _ in range(queries)]
+    with trace.span("bench.nearest", queries=queries):
+        for x, y in points:
+            model.snap_index.nearest(x, y, lambda node, data: data[1] == "input" and not graph.is_connected(node))
+
+    with trace.span("bench.validate", buildings=len(model)):
+        model.overlaps()
+
+    flow = build_flow(layout, solid_resources, input_rates)
+    with trace.span("bench.flow_solve", nodes=len(flow.nodes), edges=len(flow.edges)):
+        flow.solve()
+    miners = [node_id for node_id, node in flow.nodes.items() if node.supply]
+    edited = rng.sample(miners, min(100, len(miners)))
+    with trace.span("bench.flow_update", edits=len(edited)):
+        for node_id in edited:
+            flow.set_node_rates(node_id, supply=flow.nodes[node_id].supply * 2)
+            flow.update()
+
+    victims = rng.sample(records, len(records) // 10)
+    with trace.span("bench.delete", buildings=len(victims)):
+        for record in victims:
+            model.remove_building(record)
+            graph.remove_building(record)
+    return model
+
+
+def run_tk(layout, rng, frames, queries):
+    from FactoryPlanner import FactoryPlanner
+    planner = FactoryPlanner()
+    planner.withdraw()
+    names = ("add_layout_buildings", "add_layout_connections", "move_buildings", "delete_buildings", "refresh_flow", "to_layout")
+    trace.instrument(planner, names)
+    try:
+        with trace.span("bench.tk_spawn", buildings=len(layout)):
+            spawned = []
+            planner.add_layout_buildings(layout, 0, len(layout), spawned)
+        with trace.span("bench.tk_connect", connections=layout.connection_count()):
+            planner.add_layout_connections(layout, 0, layout.connection_count(), spawned)
+            planner.refresh_flow()
+        with trace.span("bench.tk_draw"):
+            planner.viewport.update()
+            planner.update_idletasks()
+
+        group = rng.sample(list(planner.buildings.values()), min(50, len(planner.buildings)))
+        planner.select_buildings(group)
+        with trace.span("bench.tk_drag", buildings=len(group), frames=frames):
+            for _ in range(frames):
+                planner.move_buildings(group[0], 3, 1)
+            planner.update_idletasks()
+
+        extent = math.ceil(math.sqrt(len(layout))) * SPACING
+        points = [(rng.uniform(0, extent), rng.uniform(0, extent)) for _ in range(queries)]
+        with trace.span("bench.tk_nearest", queries=queries):
+            for x, y in points:
+                planner.snap_index.nearest(x, y)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "benchmark.fpl")
+            with trace.span("bench.tk_save"):
+                save_layout(path, planner.to_layout())
+            with trace.span("bench.tk_load"):
+                loaded = load_layout(path)
+                planner.clear_factory()
+                spawned = []
+                planner.add_layout_buildings(loaded, 0, len(loaded), spawned)
+                planner.add_layout_connections(loaded, 0, loaded.connection_count(), spawned)
+                planner.refresh_flow()
+
+        victims = rng.sample(list(planner.buildings.values()), len(planner.buildings) // 10)
+        with trace.span("bench.tk_delete", buildings=len(victims)):
+            planner.delete_buildings(victims)
+    finally:
+        trace.uninstrument(planner, names)
+        planner.destroy()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the planner's hot paths on a synthetic factory.")
+    parser.add_argument("-n", "--buildings", type=int, default=10000)
+    parser.add_argument("-m", "--belts", type=int, default=None, help="Belts to connect (default: as many as buildings)")
+    parser.add_argument("--frames", type=int, default=100, help="Drag frames")
+    parser.add_argument("--queries", type=int, default=10000, help="Nearest snapping point lookups")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tk", action="store_true", help="Drive a withdrawn FactoryPlanner instead of the model classes")
+    parser.add_argument("--json", help="Also write the timings to this file, for comparing runs")
+    args = parser.parse_args(argv)
+
+    # The planner loads its data files from the working directory
+    json_path = os.path.abspath(args.json) if args.json else None
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    catalog = BuildingCatalog.load('building_types.json')
+    with open('solid_resources.json', 'r') as f:
+        solid_resources = json.load(f)["solid_resources"]
+    with open('recipes.json', 'r') as f:
+        input_rates = building_input_rates(json.load(f)["recipes"], catalog)
+
+    rng = random.Random(args.seed)
+    layout = synthetic_layout(catalog, args.buildings, args.buildings if args.belts is None else args.belts, args.seed)
+    timings = TimingHook()
+    trace.add_hook(timings)
+    try:
+        if args.tk:
+            import tkinter
+            try:
+                run_tk(layout, rng, args.frames, args.queries)
+            except tkinter.TclError as error:  # No display
+                print(f"Cannot open the planner: {error}", file=sys.stderr)
+                return 2
+        else:
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, "benchmark.fpl")
+                with trace.span("bench.save"):
+                    save_layout(path, layout)
+                # The file is mapped lazily, so the load is timed up to a built model and flow graph
+                with trace.span("bench.load", buildings=len(layout), connections=layout.connection_count()):
+                    loaded = load_layout(path)
+                    build_model(loaded, catalog)
+                    build_flow(loaded, solid_resources, input_rates)
+                del loaded  # Unmaps the file before the directory is removed
+            run_headless(layout, catalog, solid_resources, input_rates, rng, args.frames, args.queries)
+    finally:
+        trace.remove_hook(timings)
+
+    print(f"{len(layout)} buildings, {layout.connection_count()} belts")
+    print(f"{'event':<28}{'count':>8}{'total ms':>12}{'mean ms':>12}{'max ms':>12}")
+    for event, (count, total, worst) in sorted(timings.stats.items()):
+        print(f"{event:<28}{count:>8}{total * 1000:>12.2f}{total * 1000 / count:>12.4f}{worst * 1000:>12.4f}")
+    if json_path:
+        with open(json_path, 'w') as f:
+            json.dump({event: {"count": count, "total": total, "max": worst} for event, (count, total, worst) in timings.stats.items()}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,60 @@
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from classes import LayoutCheck
+
+# Headless checks for saved .fpl layouts: overlapping buildings, unconnected ports, belts that join two inputs or
+# two outputs, and a throughput summary per file. Directories are searched recursively and
+# files are checked in parallel, one catalog load per worker process. Never imports tkinter.
+
+
+def collect(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files.extend(os.path.join(root, name) for name in sorted(names) if name.endswith(".fpl"))
+        else:
+            files.append(path)
+    return files
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check saved factory layouts without opening the planner.")
+    parser.add_argument("paths", nargs="+", help="Layout files or directories of .fpl files")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="Worker processes (default: one per CPU)")
+    parser.add_argument("--building-types", default="building_types.json")
+    parser.add_argument("--resources", default="solid_resources.json")
+    parser.add_argument("--recipes", default="recipes.json", help="Recipes that set how much each machine can process")
+    parser.add_argument("--simulate", action="store_true", help="Also simulate splitter and merger networks until they settle")
+    parser.add_argument("-q", "--quiet", action="store_true", help="Only print layouts that fail")
+    args = parser.parse_args(argv)
+
+    files = collect(args.paths)
+    init_args = (args.building_types, args.resources, args.simulate, args.recipes)
+    if args.jobs <= 1 or len(files) <= 1:
+        LayoutCheck.init_worker(*init_args)
+        reports = map(LayoutCheck.check_path, files)
+        pool = None
+    else:
+        pool = ProcessPoolExecutor(max_workers=args.jobs, initializer=LayoutCheck.init_worker, initargs=init_args)
+        reports = pool.map(LayoutCheck.check_path, files, chunksize=max(1, len(files) // (args.jobs * 4)))
+
+    failed = 0
+    try:
+        for report in reports:
+            if not report.ok:
+                failed += 1
+            if not report.ok or not args.quiet:
+                print(report.summary())
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    print(f"{len(files)} layouts checked, {failed} failed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,383 @@
+# AutoLayout.py
+import heapq
+import math
+from array import array
+from classes.ConnectionGraph import BELT_CAPACITIES
+from classes.FlowSolver import EPSILON
+from classes.LayoutFile import Layout
+
+FREE = 0
+BUILDING = 1  # Never crossed by a belt
+BELT = 2  # Crossed at a cost, so later belts prefer free cells
+DIRECTIONS = ((1, 0), (0, 1), (-1, 0), (0, -1))  # east, south, west, north
+
+
+class OccupancyGrid:
+    # One byte per grid cell, row-major
+    def __init__(self, columns, rows):
+        self.columns = columns
+        self.rows = rows
+        self.cells = bytearray(columns * rows)
+
+    def cell(self, column, row):
+        return row * self.columns + column
+
+    def mark_rect(self, column0, row0, column1, row1, value):
+        # Cells column0 <= c < column1, row0 <= r < row1
+        width = column1 - column0
+        for row in range(row0, row1):
+            start = row * self.columns + column0
+            self.cells[start:start + width] = bytes([value]) * width
+
+
+# Weighted A* over an OccupancyGrid with 4-neighbour moves, a penalty for turning and for
+# crossing belts that are already routed. The per-cell cost, parent and visited arrays are
+# allocated once and stamped with a search generation, so each route only touches the cells
+# it expands instead of clearing state for the whole grid.
+class BeltRouter:
+    turn_cost = 1
+    belt_cost = 1
+    heuristic_weight = 2.0  # Above 1 trades a slightly longer belt for far fewer expansions
+
+    def __init__(self, grid):
+        self.grid = grid
+        size = grid.columns * grid.rows
+        self.cost = array("d", bytes(8 * size))
+        self.parent = array("l", bytes(array("l").itemsize * size))
+        self.heading = bytearray(size)  # Direction index the cell was entered with
+        self.seen = array("L", bytes(array("L").itemsize * size))  # Generation the cost is valid for
+        self.closed = array("L", bytes(array("L").itemsize * size))
+        self.generation = 0
+
+    def route(self, start, goal):
+        # Cells from start to goal inclusive, or None when the goal cannot be reached
+        grid = self.grid
+        columns, rows, cells = grid.columns, grid.rows, grid.cells
+        cost, parent, heading, seen, closed = self.cost, self.parent, self.heading, self.seen, self.closed
+        self.generation += 1
+        generation = self.generation
+        goal_x, goal_y = goal % columns, goal // columns
+        weight = self.heuristic_weight
+
+        seen[start] = generation
+        cost[start] = 0.0
+        parent[start] = -1
+        heading[start] = 4  # No direction yet
+        heap = [(0.0, 0.0, start)]
+        while heap:
+            _, negative_cost, cell = heapq.heappop(heap)
+            if closed[cell] == generation:
+                continue
+            closed[cell] = generation
+            if cell == goal:
+                break
+            cell_cost = -negative_cost
+            x, y = cell % columns, cell // columns
+            entered = heading[cell]
+            for direction, (dx, dy) in enumerate(DIRECTIONS):
+                nx, ny = x + dx, y + dy
+                if nx < 0 or ny < 0 or nx >= columns or ny >= rows:
+                    continue
+                neighbour = ny * columns + nx
+                occupied = cells[neighbour]
+                if occupied == BUILDING and neighbour != goal:
+                    continue
+                step = 1.0
+                if occupied == BELT:
+                    step += self.belt_cost
+                if entered != 4 and entered != direction:
+                    step += self.turn_cost
+                new_cost = cell_cost + step
+                if seen[neighbour] != generation or new_cost < cost[neighbour]:
+                    seen[neighbour] = generation
+                    cost[neighbour] = new_cost
+                    parent[neighbour] = cell
+                    heading[neighbour] = direction
+                    estimate = new_cost + weight * (abs(goal_x - nx) + abs(goal_y - ny))
+                    # Prefer the deeper of two equal estimates, which keeps open-field searches narrow
+                    heapq.heappush(heap, (estimate, -new_cost, neighbour))
+        else:
+            return None
+        if closed[goal] != generation:
+            return None
+
+        path = []
+        cell = goal
+        while cell != -1:
+            path.append(cell)
+            cell = parent[cell]
+        path.reverse()
+        return path
+
+    def mark(self, path):
+        cells = self.grid.cells
+        for cell in path:
+            if cells[cell] == FREE:
+                cells[cell] = BELT
+
+
+def port_side(x, y, width, height):
+    # Outward direction (dx, dy) of a snapping point on the edge of a building
+    if x <= 0:
+        return -1, 0
+    if x >= width:
+        return 1, 0
+    if y <= 0:
+        return 0, -1
+    return 0, 1
+
+
+def production_units(plan, recipes, solid_resources):
+    # (depth, building name, produced item, input items, resource, purity, items/min produced) for
+    # every machine of a plan, at the clock speed the plan runs it at
+    depth = {}
+
+    def depth_of(item):
+        if item not in depth:
+            recipe_name = next((name for name in plan.buildings if item in recipes[name]["outputs"]), None)
+            if recipe_name is None:
+                depth[item] = 0
+            else:
+                depth[item] = 0  # Guards against cycles while recursing
+                depth[item] = 1 + max((depth_of(ingredient) for ingredient in recipes[recipe_name]["inputs"]), default=0)
+        return depth[item]
+
+    units = []
+    for resource, purity, count, clock in plan.miners:
+        rate = solid_resources.get(resource, {}).get(f"{purity.lower()}_rate", 0) * clock
+        units.extend([(0, "Miner", resource, (), resource, purity, rate)] * count)
+    for recipe_name, (building, count, clock) in plan.buildings.items():
+        recipe = recipes[recipe_name]
+        item = next(iter(recipe["outputs"]))
+        units.extend([(depth_of(item), building, item, tuple(recipe["inputs"]), None, None, recipe["outputs"][item] * clock)] * count)
+    return units
+
+
+def belt_mark(rate):
+    # Slowest belt mark that carries rate items/min, or the fastest when none does
+    return next((mk for mk, capacity in BELT_CAPACITIES.items() if capacity >= rate - EPSILON), next(reversed(BELT_CAPACITIES)))
+
+
+def chain_length(ends):
+    # Three-way splitters or mergers needed to join one belt to this many
+    return math.ceil((ends - 1) / 2) if ends > 1 else 0
+
+
+def assign(producers, consumers):
+    # Split the longer list into contiguous groups, one per end of the shorter, as
+    # [(producer ends, consumer ends), ...] with one side of every pair a single end
+    if len(consumers) >= len(producers):
+        groups = [[] for _ in producers]
+        for index, consumer in enumerate(consumers):
+            groups[index * len(producers) // len(consumers)].append(consumer)
+        return [([producer], group) for producer, group in zip(producers, groups)]
+    groups = [[] for _ in consumers]
+    for index, producer in enumerate(producers):
+        groups[index * len(consumers) // len(producers)].append(producer)
+    return [(group, [consumer]) for consumer, group in zip(consumers, groups)]
+
+
+# Places a planned production chain on the grid, one column group per production depth with
+# miners on the left, and routes orthogonal belts from producers to consumers of their item.
+# The producers and consumer inputs of an item are matched up in contiguous groups down their
+# columns; a producer feeding several inputs gets a chain of splitters in the channel to its
+# right, and several producers feeding one input a chain of mergers in the channel to its left,
+# with the channels widened to hold them. Every belt gets the slowest mark that carries its
+# planned rate. Returns the layout, the routes and the number of inputs left without a belt
+# because nothing in the plan makes their item.
+def auto_layout(plan, recipes, solid_resources, catalog, grid_size, column_limit=None, gap=2, channel=8):
+    units = [unit for unit in production_units(plan, recipes, solid_resources) if unit[1] in catalog]
+    if column_limit is None:
+        # Taller columns for bigger chains keep the layout roughly square and belts short
+        column_limit = max(40, int(math.sqrt(len(units)) * 2.5))
+    layers = {}
+    for unit in units:
+        layers.setdefault(unit[0], []).append(unit)
+
+    def port_lists(building_type):
+        ports = building_type.ports
+        return ([port for port, (_, _, port_type) in enumerate(ports) if port_type == "output"],
+                [port for port, (_, _, port_type) in enumerate(ports) if port_type == "input"])
+
+    # Longest balancer chain each item needs on its producer or consumer side
+    producer_count, consumer_count = {}, {}
+    for _, name, item, input_items, _, _, _ in units:
+        output_ports, input_ports = port_lists(catalog.get(name))
+        if output_ports:
+            producer_count[item] = producer_count.get(item, 0) + 1
+        for input_item, _ in zip(input_items, input_ports):
+            consumer_count[input_item] = consumer_count.get(input_item, 0) + 1
+    splitters, mergers = {}, {}  # item -> balancers per chain
+    for item, producers in producer_count.items():
+        consumers = consumer_count.get(item, 0)
+        if consumers > producers:
+            splitters[item] = chain_length(math.ceil(consumers / producers))
+        elif producers > consumers > 0:
+            mergers[item] = chain_length(math.ceil(producers / consumers))
+    splitter_type, merger_type = catalog.get("Splitter"), catalog.get("Merger")
+    balancer_columns = max((math.ceil(building_type.width / grid_size) + 1 for building_type in (splitter_type, merger_type) if building_type), default=0)
+
+    # Stack each layer into sub-columns of at most column_limit machines, in cells, with room
+    # for the mergers in front of each and the splitters behind it
+    placed = []  # (unit, column, row, building type)
+    column = channel
+    layer_columns = []
+    for depth in sorted(layers):
+        members = sorted(layers[depth], key=lambda unit: (unit[2], unit[1]))
+        layer_columns.append([])
+        for start in range(0, len(members), column_limit):
+            chunk = members[start:start + column_limit]
+            types = [catalog.get(unit[1]) for unit in chunk]
+            width = max(math.ceil(building_type.width / grid_size) for building_type in types)
+            column += balancer_columns * max(sum(mergers.get(item, 0) for item in unit[3]) for unit in chunk)
+            row = 0
+            entries = []
+            for unit, building_type in zip(chunk, types):
+                entries.append([unit, column, row, building_type])
+                row += math.ceil(building_type.height / grid_size) + gap
+            layer_columns[-1].append((entries, row))
+            column += width + channel + balancer_columns * max(splitters.get(unit[2], 0) for unit in chunk)
+
+    # Centre every sub-column on the tallest one so belts between them stay short
+    tallest = max((height for group in layer_columns for _, height in group), default=0)
+    for group in layer_columns:
+        for entries, height in group:
+            for entry in entries:
+                entry[2] += channel + (tallest - height) // 2
+                placed.append(tuple(entry))
+
+    grid = OccupancyGrid(column + channel, tallest + 2 * channel)
+    layout = Layout()
+    outputs = {}  # item -> [(building index, port), ...]
+    inputs = {}
+    output_rates = {}  # building index -> items/min it puts on its output belt
+    for index, (unit, column, row, building_type) in enumerate(placed):
+        _, name, item, input_items, resource, purity, rate = unit
+        layout.add_building(name, column * grid_size, row * grid_size, resource, purity)
+        grid.mark_rect(column, row, column + math.ceil(building_type.width / grid_size), row + math.ceil(building_type.height / grid_size), BUILDING)
+
+        output_ports, input_ports = port_lists(building_type)
+        if output_ports:
+            outputs.setdefault(item, []).append((index, output_ports[0]))
+            output_rates[index] = rate
+        for input_item, port in zip(input_items, input_ports):
+            inputs.setdefault(input_item, []).append((index, port))
+
+    def add_balancer(building_type, column, row):
+        placed.append((None, column, row, building_type))
+        grid.mark_rect(column, row, column + math.ceil(building_type.width / grid_size), row + math.ceil(building_type.height / grid_size), BUILDING)
+        return layout.add_building(building_type.name, column * grid_size, row * grid_size)
+
+    def port_row(index, port, building_type, balancer_port):
+        # Row that lines a balancer's port up with a port of a placed building
+        _, _, row, placed_type = placed[index]
+        return row + round((placed_type.ports[port][1] - building_type.ports[balancer_port][1]) / grid_size)
+
+    def split(producer, consumers):
+        # Splitters to the right of the producer, each passing the rest on from its east output
+        index, port = producer
+        _, column, _, building_type = placed[index]
+        column += math.ceil(building_type.width / grid_size) + 1
+        output_ports, (input_port,) = port_lists(splitter_type)
+        row = port_row(index, port, splitter_type, input_port)
+        share = output_rates[index] / len(consumers)
+        links = []
+        source = producer
+        remaining = list(consumers)
+        for _ in range(chain_length(len(consumers))):
+            splitter = add_balancer(splitter_type, column, row)
+            links.append((source, (splitter, input_port), share * len(remaining)))
+            ends = output_ports if len(remaining) <= len(output_ports) else [port for port in output_ports if port != output_ports[1]]
+            for port, consumer in zip(ends, remaining):
+                links.append(((splitter, port), consumer, share))
+            remaining = remaining[len(ends):]
+            source = (splitter, output_ports[1])  # East
+            column += balancer_columns
+        return links
+
+    def merge(producers, consumer, offset):
+        # Mergers to the left of the consumer, each taking the rest in through its west input
+        index, port = consumer
+        _, column, _, _ = placed[index]
+        (output_port,), input_ports = port_lists(merger_type)
+        west = input_ports[-1]
+        row = port_row(index, port, merger_type, output_port)
+        links = []
+        target = consumer
+        remaining = list(producers)
+        for step in range(chain_length(len(producers))):
+            merger = add_balancer(merger_type, column - (offset + step + 1) * balancer_columns, row)
+            links.append(((merger, output_port), target, sum(output_rates[end[0]] for end in remaining)))
+            ends = input_ports if len(remaining) <= len(input_ports) else input_ports[:-1]
+            for port, producer in zip(ends, remaining):
+                links.append((producer, (merger, port), output_rates[producer[0]]))
+            remaining = remaining[len(ends):]
+            target = (merger, west)
+        return links
+
+    links = []  # ((building index, port), (building index, port), items/min) from output to input
+    merged = {}  # consumer building index -> mergers already in front of it
+    unfed = 0
+    for item, consumers in inputs.items():
+        producers = outputs.get(item)
+        if not producers:
+            unfed += len(consumers)
+            continue
+        # Group in order of height so belts run mostly across the channels, not along them
+        producers = sorted(producers, key=lambda end: placed[end[0]][2])
+        consumers = sorted(consumers, key=lambda end: placed[end[0]][2])
+        for group_producers, group_consumers in assign(producers, consumers):
+            if len(group_consumers) > 1 and splitter_type is not None:
+                links.extend(split(group_producers[0], group_consumers))
+            elif len(group_producers) > 1 and merger_type is not None:
+                consumer = group_consumers[0]
+                links.extend(merge(group_producers, consumer, merged.get(consumer[0], 0)))
+                merged[consumer[0]] = merged.get(consumer[0], 0) + chain_length(len(group_producers))
+            else:
+                # Without balancers in the catalog only the first of a group is connected
+                links.append((group_producers[0], group_consumers[0], output_rates[group_producers[0][0]]))
+                unfed += len(group_consumers) - 1
+
+    router = BeltRouter(grid)
+    routes = {}  # connection index -> world points the belt bends at
+
+    def port_cell(index, port):
+        _, column, row, building_type = placed[index]
+        port_x, port_y, _ = building_type.ports[port]
+        dx, dy = port_side(port_x, port_y, building_type.width, building_type.height)
+        x = column * grid_size + port_x + dx * grid_size / 2
+        y = row * grid_size + port_y + dy * grid_size / 2
+        return grid.cell(int(x // grid_size), int(y // grid_size)), (column * grid_size + port_x, row * grid_size + port_y), (dx, dy)
+
+    for producer, consumer, rate in links:
+        start, start_point, start_side = port_cell(*producer)
+        goal, end_point, end_side = port_cell(*consumer)
+        path = router.route(start, goal)
+        connection = layout.connection_count()
+        layout.add_connection(producer[0], producer[1], consumer[0], consumer[1], belt_mark(rate))
+        if path is None:
+            continue
+        router.mark(path)
+        routes[connection] = route_points(path, grid, grid_size, start_point, start_side, end_point, end_side)
+
+    return layout, routes, unfed
+
+
+def route_points(path, grid, grid_size, start_point, start_side, end_point, end_side):
+    # Bend points of a routed belt in world coordinates: out of the start port, through the
+    # centres of the cells where the path turns, and into the end port
+    def centre(cell):
+        return (cell % grid.columns + 0.5) * grid_size, (cell // grid.columns + 0.5) * grid_size
+
+    def lead(point, side, cell):
+        # Leave the port straight along its outward direction, then line up with the cell
+        x, y = centre(cell)
+        return (x, point[1]) if side[0] else (point[0], y)
+
+    points = [lead(start_point, start_side, path[0]), centre(path[0])]
+    for previous, cell, following in zip(path, path[1:], path[2:]):
+        if cell - previous != following - cell:
+            points.append(centre(cell))
+    points.append(centre(path[-1]))
+    points.append(lead(end_point, end_side, path[-1]))
+    return tuple(points)
@@ -0,0 +1,64 @@
+# Blueprint.py
+from classes.LayoutFile import Layout
+
+
+# Reusable group of buildings and belts, compiled once against the BuildingCatalog. Each
+# placement keeps the shared BuildingType (and so its precomputed port layout) with an offset
+# from the blueprint origin, and each belt is stored as a pair of node offsets. Because
+# FactoryModel hands out node ids contiguously, a stamp placed with first node n has its belts
+# at n + offset and needs no per-port lookups.
+class Blueprint:
+    def __init__(self, name, placements, connections, origin_x=0, origin_y=0, routes=None):
+        self.name = name
+        self.placements = tuple(placements)  # ((BuildingType, dx, dy, resource, purity), ...)
+        self.connections = tuple(connections)  # ((start node offset, end node offset, mk), ...)
+        self.origin_x = origin_x  # Where the blueprint was taken from, kept for grid alignment
+        self.origin_y = origin_y
+        self.routes = routes or {}  # connection index -> bend points relative to the origin
+        self.width = max((dx + building_type.width for building_type, dx, *_ in self.placements), default=0)
+        self.height = max((dy + building_type.height for building_type, _, dy, *_ in self.placements), default=0)
+
+    def __len__(self):
+        return len(self.placements)
+
+    @classmethod
+    def from_layout(cls, name, layout, catalog, routes=None):
+        # Compile a Layout; unknown building types and the belts attached to them are dropped.
+        # routes maps layout connection indexes to belt bend points, as from auto_layout.
+        origin_x = min(layout.xs, default=0)
+        origin_y = min(layout.ys, default=0)
+        placements = []
+        first_nodes = []  # layout building index -> node offset, or None when skipped
+        node_count = 0
+        for index in range(len(layout)):
+            type_name, x, y, resource, purity = layout.building(index)
+            building_type = catalog.get(type_name)
+            if building_type is None:
+                first_nodes.append(None)
+                continue
+            placements.append((building_type, x - origin_x, y - origin_y, resource, purity))
+            first_nodes.append(node_count)
+            node_count += len(building_type.ports)
+
+        connections = []
+        relative_routes = {}
+        for index in range(layout.connection_count()):
+            start_building, start_port, end_building, end_port, mk = layout.connection(index)
+            if first_nodes[start_building] is None or first_nodes[end_building] is None:
+                continue
+            if routes and index in routes:
+                relative_routes[len(connections)] = tuple((x - origin_x, y - origin_y) for x, y in routes[index])
+            connections.append((first_nodes[start_building] + start_port, first_nodes[end_building] + end_port, mk))
+
+        return cls(name, placements, connections, origin_x, origin_y, relative_routes)
+
+    def to_layout(self):
+        # Layout at the original position, for saving with save_layout
+        layout = Layout()
+        node_building = []  # node offset -> (placement index, port)
+        for index, (building_type, dx, dy, resource, purity) in enumerate(self.placements):
+            layout.add_building(building_type.name, self.origin_x + dx, self.origin_y + dy, resource, purity)
+            node_building.extend((index, port) for port in range(len(building_type.ports)))
+        for start, end, mk in self.connections:
+            layout.add_connection(*node_building[start], *node_building[end], mk)
+        return layout
@@ -1,140 +1,235 @@
 # Building.py
 import textwrap
 
+# Canvas view of a BuildingRecord from FactoryModel. Position, size and snapping points live
+# in the record; the canvas items that draw it only exist while it is shown (see Viewport),
+# so ids of the rectangle, label and ovals may change between show() calls while the record
+# and its node ids stay the same.
 class Building:
-    def __init__(self, canvas, x, y, name, config, grid_size, deselect_all_callback, node_select_callback, update_connections_callback, on_click_callback=None):
+    __slots__ = (
+        "canvas", "record", "model", "grid_size", "transform", "scheduler", "tag",
+        "deselect_all_callback", "node_select_callback", "on_click_callback", "select_callback", "move_callback",
+        "rect", "label", "label_text", "point_items", "drag_x", "drag_y", "drag_dx", "drag_dy", "selected", "colliding",
+    )
+
+    def __init__(self, canvas, record, grid_size, deselect_all_callback, node_select_callback, on_click_callback=None, model=None, select_callback=None, transform=None, scheduler=None, move_callback=None):
         self.canvas = canvas
-        self.name = name
-        self.width = config["width"]
-        self.height = config["height"]
-        self.connectors = config["connectors"]
+        self.record = record
+        self.model = model  # Optional FactoryModel that moves the record and its snapping points
+        self.grid_size = grid_size
+        self.transform = transform  # Optional ViewTransform from world to canvas coordinates
+        self.scheduler = scheduler  # Optional UpdateScheduler that coalesces drag updates per frame
+        self.tag = f"building{record.id}"  # Shared by all of this building's canvas items
         self.deselect_all_callback = deselect_all_callback
         self.node_select_callback = node_select_callback
-        self.update_connections_callback = update_connections_callback
         self.on_click_callback = on_click_callback
-        self.grid_size = grid_size
+        self.select_callback = select_callback  # (building, event), decides how a press changes the selection
+        self.move_callback = move_callback  # (building, dx, dy), moves the building, its belts and the rest of the selection
 
-        # Create the building rectangle
-        self.rect = self.canvas.create_rectangle(x, y, x + self.width, y + self.height, fill="blue")
+        # Canvas items, created by show()
+        self.rect = None
+        self.label = None
+        self.label_text = None  # Unwrapped, defaults to the building name
+        self.point_items = None  # node -> oval id while snapping points are drawn
 
-        # Create the label for the building
-        self.label = self.canvas.create_text(x + self.width / 2, y + self.height / 2, text=name, fill="white", width=self.width)
+        self.drag_x = 0
+        self.drag_y = 0
+        self.drag_dx = 0  # Screen pixels dragged but not drawn yet
+        self.drag_dy = 0
+        self.selected = False
+        self.colliding = False  # Overlaps another building
 
-        # Create snapping points based on connectors
-        self.snapping_points = self.create_snapping_points()
+    @property
+    def name(self):
+        return self.record.name
 
-        # Bind events for dragging
-        self.canvas.tag_bind(self.rect, "<ButtonPress-1>", self.on_press)
-        self.canvas.tag_bind(self.rect, "<B1-Motion>", self.on_drag)
-        self.canvas.tag_bind(self.rect, "<ButtonRelease-1>", self.on_release)
+    @property
+    def x(self):
+        return self.record.x
+
+    @property
+    def y(self):
+        return self.record.y
+
+    @property
+    def width(self):
+        return self.record.width
+
+    @property
+    def height(self):
+        return self.record.height
+
+    @property
+    def snapping_points(self):
+        return self.record.snapping_points()
+
+    @property
+    def output_rate(self):
+        return self.record.output_rate
+
+    @output_rate.setter
+    def output_rate(self, value):
+        self.record.output_rate = value
+
+    @property
+    def resource(self):
+        return self.record.resource
+
+    @resource.setter
+    def resource(self, value):
+        self.record.resource = value
+
+    @property
+    def purity(self):
+        return self.record.purity
+
+    @purity.setter
+    def purity(self, value):
+        self.record.purity = value
+
+    def port_positions(self):
+        return self.record.port_positions()
+
+    def is_shown(self):
+        return self.rect is not None
+
+    def show(self, detailed=True):
+        # Create the canvas items; labels and snapping points only when detailed
+        if self.rect is None:
+            x0, y0 = self.to_canvas(self.x, self.y)
+            x1, y1 = self.to_canvas(self.x + self.width, self.y + self.height)
+            self.rect = self.canvas.create_rectangle(x0, y0, x1, y1, fill=self.fill_color(), tags=self.tags())
+            if self.selected:
+                self.canvas.itemconfig(self.rect, outline="blue", width=2)
+            self.bind_drag(self.rect)
+        self.set_detail(detailed)
+
+    def set_detail(self, detailed):
+        if detailed and self.label is None:
+            # Create the label for the building
+            label_x, label_y = self.to_canvas(self.x + self.width / 2, self.y + self.height / 2)
+            self.label = self.canvas.create_text(label_x, label_y, text=self.wrapped_label(), fill="white", width=self.width * self.scale(), tags=self.tags())
+            self.bind_drag(self.label)
 
-        # Bind label dragging to rectangle dragging
-        self.canvas.tag_bind(self.label, "<ButtonPress-1>", self.on_press)
-        self.canvas.tag_bind(self.label, "<B1-Motion>", self.on_drag)
-        self.canvas.tag_bind(self.label, "<ButtonRelease-1>", self.on_release)
+            radius = 3 * self.scale()
+            self.point_items = {}
+            for point, snap_x, snap_y, point_type in self.port_positions():
+                snap_x, snap_y = self.to_canvas(snap_x, snap_y)
+                color = "green" if point_type == "input" else "red"
+                item = self.canvas.create_oval(
+                    snap_x - radius, snap_y - radius, snap_x + radius, snap_y + radius, fill=color, tags=self.tags()
+                )
+
+                # Bind event for node selection
+                self.canvas.tag_bind(item, "<ButtonPress-1>", lambda event, node=point, ntype=point_type: self.node_select_callback(self, node, ntype))
+                self.point_items[point] = item
+
+        elif not detailed and self.label is not None:
+            self.canvas.delete(self.label)
+            for item in self.point_items.values():
+                self.canvas.delete(item)
+            self.label = None
+            self.point_items = None
+
+    def hide(self):
+        # Delete the canvas items, keeping position and snapping points
+        if self.rect is not None:
+            self.canvas.delete(self.tag)
+        self.rect = None
+        self.label = None
+        self.point_items = None
+
+    def bind_drag(self, item):
+        # Bind events for dragging
+        self.canvas.tag_bind(item, "<ButtonPress-1>", self.on_press)
+        self.canvas.tag_bind(item, "<B1-Motion>", self.on_drag)
+        self.canvas.tag_bind(item, "<ButtonRelease-1>", self.on_release)
 
         # Bind on-click callback if provided
         if self.on_click_callback:
-            self.canvas.tag_bind(self.rect, "<Double-Button-1>", self.on_double_click)
-            self.canvas.tag_bind(self.label, "<Double-Button-1>", self.on_double_click)
+            self.canvas.tag_bind(item, "<Double-Button-1>", self.on_double_click)
 
-        self.drag_data = {"x": 0, "y": 0}
-        self.selected = False
+    def tags(self):
+        # Selected buildings also carry the shared "selected" tag so a group moves with one call
+        return (self.tag, "selected") if self.selected else (self.tag,)
+
+    def scale(self):
+        return self.transform.scale if self.transform is not None else 1.0
+
+    def to_canvas(self, x, y):
+        return self.transform.to_canvas(x, y) if self.transform is not None else (x, y)
+
+    def point_item(self, node):
+        return self.point_items.get(node) if self.point_items else None
+
+    def move_by(self, delta_x, delta_y):
+        # Move the rectangle, label, and snapping points by a world-space delta with one tag-wide call
+        if self.rect is not None:
+            scale = self.scale()
+            self.canvas.move(self.tag, delta_x * scale, delta_y * scale)
 
-    def create_snapping_points(self):
-        snap_positions = []
-
-        for direction, points in self.connectors.items():
-            if direction == "north":
-                for i in range(points["input"]):
-                    x_pos = (i + 1) * self.width / (points["input"] + 1)
-                    snap_positions.append((x_pos, 0, "input"))
-                for i in range(points["output"]):
-                    x_pos = (i + 1) * self.width / (points["output"] + 1)
-                    snap_positions.append((x_pos, 0, "output"))
-
-            elif direction == "east":
-                for i in range(points["input"]):
-                    y_pos = (i + 1) * self.height / (points["input"] + 1)
-                    snap_positions.append((self.width, y_pos, "input"))
-                for i in range(points["output"]):
-                    y_pos = (i + 1) * self.height / (points["output"] + 1)
-                    snap_positions.append((self.width, y_pos, "output"))
-
-            elif direction == "south":
-                for i in range(points["input"]):
-                    x_pos = (i + 1) * self.width / (points["input"] + 1)
-                    snap_positions.append((x_pos, self.height, "input"))
-                for i in range(points["output"]):
-                    x_pos = (i + 1) * self.width / (points["output"] + 1)
-                    snap_positions.append((x_pos, self.height, "output"))
-
-            elif direction == "west":
-                for i in range(points["input"]):
-                    y_pos = (i + 1) * self.height / (points["input"] + 1)
-                    snap_positions.append((0, y_pos, "input"))
-                for i in range(points["output"]):
-                    y_pos = (i + 1) * self.height / (points["output"] + 1)
-                    snap_positions.append((0, y_pos, "output"))
-
-        # Create the snapping points
-        points = []
-        for cx, cy, point_type in snap_positions:
-            snap_x = self.canvas.coords(self.rect)[0] + cx
-            snap_y = self.canvas.coords(self.rect)[1] + cy
-            color = "green" if point_type == "input" else "red"
-            point = self.canvas.create_oval(
-                snap_x - 3, snap_y - 3, snap_x + 3, snap_y + 3, fill=color
-            )
-
-            # Bind event for node selection
-            self.canvas.tag_bind(point, "<ButtonPress-1>", lambda event, node=point, ntype=point_type: self.node_select_callback(self, node, ntype))
-            points.append((point, point_type))
-
-        return points
+        if self.model is not None:
+            self.model.move_building(self.record, delta_x, delta_y)
+        else:
+            self.record.x += delta_x
+            self.record.y += delta_y
 
     def on_press(self, event):
-        self.deselect_all_callback()  # Deselect other buildings and connections
-        self.select()
-        self.drag_data["x"] = event.x
-        self.drag_data["y"] = event.y
+        if self.select_callback:
+            self.select_callback(self, event)
+        else:
+            self.deselect_all_callback()  # Deselect other buildings and connections
+            self.select()
+        self.drag_x = event.x
+        self.drag_y = event.y
 
     def on_drag(self, event):
-        # Calculate the delta
-        delta_x = event.x - self.drag_data["x"]
-        delta_y = event.y - self.drag_data["y"]
-
-        # Move the rectangle, label, and snapping points
-        self.canvas.move(self.rect, delta_x, delta_y)
-        self.canvas.move(self.label, delta_x, delta_y)
-        for point, _ in self.snapping_points:
-            self.canvas.move(point, delta_x, delta_y)
+        # Accumulate the delta; the move itself happens at most once per frame
+        self.drag_dx += event.x - self.drag_x
+        self.drag_dy += event.y - self.drag_y
 
         # Update the drag data
-        self.drag_data["x"] = event.x
-        self.drag_data["y"] = event.y
+        self.drag_x = event.x
+        self.drag_y = event.y
+
+        if self.scheduler is not None:
+            self.scheduler.schedule(self, self.flush_drag)
+        else:
+            self.flush_drag()
+
+    def flush_drag(self):
+        if not self.drag_dx and not self.drag_dy:
+            return
 
-        # Update connections
-        self.update_connections_callback(self)
+        # Convert the pending screen pixels to world units
+        delta_x = self.drag_dx / self.scale()
+        delta_y = self.drag_dy / self.scale()
+        self.drag_dx = self.drag_dy = 0
+        self.apply_move(delta_x, delta_y)
+
+    def apply_move(self, delta_x, delta_y):
+        if self.move_callback:
+            self.move_callback(self, delta_x, delta_y)
+        else:
+            self.move_by(delta_x, delta_y)  # Just the rectangle, label and snapping points
 
     def on_release(self, event):
+        # Apply any motion still waiting for the next frame
+        if self.scheduler is not None:
+            self.scheduler.flush_key(self)
+        self.flush_drag()
+
         # Snap to grid logic for the building's center
-        x0, y0, x1, y1 = self.canvas.coords(self.rect)
-        center_x = (x0 + x1) / 2
-        center_y = (y0 + y1) / 2
+        center_x = self.x + self.width / 2
+        center_y = self.y + self.height / 2
         new_center_x = round(center_x / self.grid_size) * self.grid_size
         new_center_y = round(center_y / self.grid_size) * self.grid_size
         offset_x = new_center_x - center_x
         offset_y = new_center_y - center_y
 
         # Move the building, label, and its points to the snapped position
-        self.canvas.move(self.rect, offset_x, offset_y)
-        self.canvas.move(self.label, offset_x, offset_y)
-        for point, _ in self.snapping_points:
-            self.canvas.move(point, offset_x, offset_y)
-
-        # Update connections
-        self.update_connections_callback(self)
+        if offset_x or offset_y:
+            self.apply_move(offset_x, offset_y)
 
     def on_double_click(self, event):
         if self.on_click_callback:
@@ -142,21 +237,35 @@ class Building:
 
     def select(self):
         self.selected = True
-        self.canvas.itemconfig(self.rect, outline="blue", width=2)
+        if self.rect is not None:
+            self.canvas.itemconfig(self.rect, outline="blue", width=2)
+            self.canvas.addtag_withtag("selected", self.tag)
 
     def deselect(self):
         self.selected = False
-        self.canvas.itemconfig(self.rect, outline="", width=1)
+        if self.rect is not None:
+            self.canvas.itemconfig(self.rect, outline="", width=1)
+            self.canvas.dtag(self.tag, "selected")
 
     def is_selected(self):
         return self.selected
 
-    def update_output_label(self, text):
-        # Calculate the maximum width in characters based on the building width
-        char_width = int(self.width // 8)  # Roughly 8 pixels per character
+    def fill_color(self):
+        return "red" if self.colliding else "blue"
 
-        # Wrap the text to fit within the building width
-        wrapped_text = textwrap.fill(text, width=char_width)
+    def set_colliding(self, colliding):
+        self.colliding = colliding
+        if self.rect is not None:
+            self.canvas.itemconfig(self.rect, fill=self.fill_color())
+
+    def update_output_label(self, text):
+        # Update the label text to show resource and purity; it is only wrapped once drawn
+        self.label_text = text
+        if self.label is not None:
+            self.canvas.itemconfig(self.label, text=self.wrapped_label())
 
-        # Update the label text to show resource and purity
-        self.canvas.itemconfig(self.label, text=wrapped_text)
+    def wrapped_label(self):
+        # Wrap the text to fit within the building width, roughly 8 pixels per character
+        if self.label_text is None:
+            return self.name
+        return textwrap.fill(self.label_text, width=int(self.width // 8))
@@ -0,0 +1,181 @@
+# BuildingCatalog.py
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+
+CATALOG_VERSION = 2  # Bump when the compiled format changes to invalidate caches
+DIRECTIONS = ("north", "east", "south", "west")
+MAX_PORTS = 255  # Port indexes are stored in one byte in layout files
+
+
+def port_layout(width, height, connectors):
+    # Snapping point offsets (x, y, node_type) relative to the top-left corner of a building
+    snap_positions = []
+
+    for direction, points in connectors.items():
+        if direction == "north":
+            for i in range(points["input"]):
+                x_pos = (i + 1) * width / (points["input"] + 1)
+                snap_positions.append((x_pos, 0, "input"))
+            for i in range(points["output"]):
+                x_pos = (i + 1) * width / (points["output"] + 1)
+                snap_positions.append((x_pos, 0, "output"))
+
+        elif direction == "east":
+            for i in range(points["input"]):
+                y_pos = (i + 1) * height / (points["input"] + 1)
+                snap_positions.append((width, y_pos, "input"))
+            for i in range(points["output"]):
+                y_pos = (i + 1) * height / (points["output"] + 1)
+                snap_positions.append((width, y_pos, "output"))
+
+        elif direction == "south":
+            for i in range(points["input"]):
+                x_pos = (i + 1) * width / (points["input"] + 1)
+                snap_positions.append((x_pos, height, "input"))
+            for i in range(points["output"]):
+                x_pos = (i + 1) * width / (points["output"] + 1)
+                snap_positions.append((x_pos, height, "output"))
+
+        elif direction == "west":
+            for i in range(points["input"]):
+                y_pos = (i + 1) * height / (points["input"] + 1)
+                snap_positions.append((0, y_pos, "input"))
+            for i in range(points["output"]):
+                y_pos = (i + 1) * height / (points["output"] + 1)
+                snap_positions.append((0, y_pos, "output"))
+
+    return tuple(snap_positions)
+
+
+def rotate_ports(ports, width, height):
+    # The same ports after turning a width x height building 90 degrees clockwise
+    return tuple((height - y, x, node_type) for x, y, node_type in ports)
+
+
+class BuildingType:
+    __slots__ = ("name", "category", "width", "height", "config", "rotations", "power_use", "power_output", "fuels")
+
+    def __init__(self, name, category, config):
+        self.name = name
+        self.category = category
+        self.width = config["width"]
+        self.height = config["height"]
+        self.config = config  # The raw entry from building_types.json
+        power = config.get("power", {})
+        self.power_use = power.get("consumption", 0)  # MW drawn while running
+        self.power_output = power.get("generation", 0)  # MW produced when fully fuelled
+        self.fuels = power.get("fuels", {})  # fuel -> items/min burnt at full output, preferred first
+
+        # Port offsets for 0, 90, 180 and 270 degrees, shared by every building of this type
+        ports = port_layout(self.width, self.height, config["connectors"])
+        rotations = [ports]
+        width, height = self.width, self.height
+        for _ in range(3):
+            ports = rotate_ports(ports, width, height)
+            width, height = height, width
+            rotations.append(ports)
+        self.rotations = tuple(rotations)
+
+    @property
+    def ports(self):
+        return self.rotations[0]
+
+    def size(self, rotation=0):
+        return (self.height, self.width) if rotation % 2 else (self.width, self.height)
+
+
+def validate(buildings):
+    # Raise ValueError for building type entries the planner cannot use
+    for category, types in buildings.items():
+        for name, config in types.items():
+            for key in ("width", "height"):
+                if not isinstance(config.get(key), (int, float)) or config[key] <= 0:
+                    raise ValueError(f"{category}/{name}: {key} must be a positive number")
+            connectors = config.get("connectors")
+            if not isinstance(connectors, dict):
+                raise ValueError(f"{category}/{name}: connectors must be an object")
+            port_count = 0
+            for direction, points in connectors.items():
+                if direction not in DIRECTIONS:
+                    raise ValueError(f"{category}/{name}: unknown connector direction {direction}")
+                for port_type in ("input", "output"):
+                    if not isinstance(points.get(port_type), int) or points[port_type] < 0:
+                        raise ValueError(f"{category}/{name}: {direction} {port_type} must be a non-negative integer")
+                    port_count += points[port_type]
+            if port_count > MAX_PORTS:
+                raise ValueError(f"{category}/{name}: more than {MAX_PORTS} connectors")
+            power = config.get("power", {})
+            if not isinstance(power, dict):
+                raise ValueError(f"{category}/{name}: power must be an object")
+            for key in ("consumption", "generation"):
+                if not isinstance(power.get(key, 0), (int, float)) or power.get(key, 0) < 0:
+                    raise ValueError(f"{category}/{name}: power {key} must be a non-negative number")
+            fuels = power.get("fuels", {})
+            if not isinstance(fuels, dict) or any(not isinstance(rate, (int, float)) or rate <= 0 for rate in fuels.values()):
+                raise ValueError(f"{category}/{name}: power fuels must map fuel names to positive items/min")
+            if power.get("generation") and not fuels:
+                raise ValueError(f"{category}/{name}: a generator needs at least one fuel")
+
+
+# Validated building types with their port layouts precomputed per rotation. load() keeps a
+# pickled copy in __pycache__ keyed on the SHA-256 of the JSON, so later launches skip
+# parsing and compiling as long as building_types.json is unchanged.
+class BuildingCatalog:
+    def __init__(self, buildings):
+        validate(buildings)
+        self.categories = {}  # category -> {name: BuildingType}, in file order
+        self.types = {}  # name -> BuildingType
+        for category, types in buildings.items():
+            self.categories[category] = {}
+            for name, config in types.items():
+                building_type = BuildingType(name, category, config)
+                self.categories[category][name] = building_type
+                self.types[name] = building_type
+
+    def __contains__(self, name):
+        return name in self.types
+
+    def __iter__(self):
+        return iter(self.types.values())
+
+    def get(self, name):
+        return self.types.get(name)
+
+    @classmethod
+    def load(cls, path='building_types.json', cache_dir=None):
+        with open(path, 'rb') as f:
+            raw = f.read()
+        digest = hashlib.sha256(raw).hexdigest()
+
+        if cache_dir is None:
+            cache_dir = os.path.join(os.path.dirname(os.path.abspath(path)), "__pycache__")
+        cache_path = os.path.join(cache_dir, os.path.splitext(os.path.basename(path))[0] + ".catalog.pickle")
+
+        try:
+            with open(cache_path, 'rb') as f:
+                version, cached_digest, catalog = pickle.load(f)
+            if version == CATALOG_VERSION and cached_digest == digest:
+                return catalog
+        except (OSError, pickle.PickleError, EOFError, ValueError, TypeError, AttributeError):
+            pass
+
+        catalog = cls(json.loads(raw)["buildings"])
+        # Written beside the cache and renamed over it, so parallel loaders never read half a file
+        temp_path = None
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            with tempfile.NamedTemporaryFile('wb', dir=cache_dir, suffix=".tmp", delete=False) as f:
+                temp_path = f.name
+                pickle.dump((CATALOG_VERSION, digest, catalog), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, cache_path)
+        except OSError:
+            # The cache is only an optimisation
+            if temp_path is not None:
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+        return catalog
@@ -0,0 +1,174 @@
+# CollisionIndex.py
+import math
+
+
+def cell_range(x0, y0, x1, y1, cell_size):
+    # Cells covered by a rectangle, as (first column, first row, last column, last row)
+    return math.floor(x0 / cell_size), math.floor(y0 / cell_size), math.floor(x1 / cell_size), math.floor(y1 / cell_size)
+
+
+def overlaps(a, b):
+    # Rectangles that only share an edge do not overlap
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+def find_overlaps(rects, cell_size=None):
+    # All pairs (i, j), i < j, of overlapping rectangles (x0, y0, x1, y1), from one bucketing pass.
+    # A pair is only tested in the buckets both rectangles share and only reported from the one
+    # holding the top-left corner of their intersection, so no pair set is needed.
+    if not rects:
+        return []
+    if cell_size is None:
+        # About twice the average building, so most rectangles land in one to four cells
+        cell_size = 2 * sum(max(x1 - x0, y1 - y0) for x0, y0, x1, y1 in rects) / len(rects) or 1
+
+    cells = {}
+    for index, rect in enumerate(rects):
+        cx0, cy0, cx1, cy1 = cell_range(*rect, cell_size)
+        for cell_x in range(cx0, cx1 + 1):
+            for cell_y in range(cy0, cy1 + 1):
+                cells.setdefault((cell_x, cell_y), []).append(index)
+
+    pairs = []
+    for (cell_x, cell_y), bucket in cells.items():
+        for position, i in enumerate(bucket):
+            a = rects[i]
+            for j in bucket[position + 1:]:
+                b = rects[j]
+                if not overlaps(a, b):
+                    continue
+                corner_x, corner_y = max(a[0], b[0]), max(a[1], b[1])
+                if math.floor(corner_x / cell_size) == cell_x and math.floor(corner_y / cell_size) == cell_y:
+                    pairs.append((i, j) if i < j else (j, i))
+    return pairs
+
+
+# Broad phase for building footprints. Every rectangle is listed in each uniform grid cell it
+# covers, so an overlap query only tests the few rectangles sharing those cells. The overlaps
+# themselves are kept up to date on every insert, move and remove, so which keys collide is
+# known without scanning, and `changed` collects the keys that started or stopped colliding
+# until take_changed() hands them to the view.
+class CollisionIndex:
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.cells = {}  # (cell_x, cell_y) -> set of keys
+        self.rects = {}  # key -> (x0, y0, x1, y1)
+        self.contacts = {}  # key -> keys it overlaps, only for keys that overlap something
+        self.changed = set()
+
+    def __len__(self):
+        return len(self.rects)
+
+    def __contains__(self, key):
+        return key in self.rects
+
+    def is_colliding(self, key):
+        return key in self.contacts
+
+    def insert(self, key, x0, y0, x1, y1):
+        if key in self.rects:
+            self.remove(key)
+        rect = (x0, y0, x1, y1)
+        self.rects[key] = rect
+        self.add_to_cells(key, cell_range(*rect, self.cell_size))
+        for other in self.query(*rect, exclude=key):
+            self.link(key, other)
+
+    def insert_many(self, items):
+        # Bulk insert of (key, x0, y0, x1, y1) for keys not in the index yet. Everything is
+        # bucketed first, and only keys that landed in a cell holding another key are queried,
+        # so loading buildings that mostly keep apart costs one bucketing pass.
+        cells, rects, cell_size, floor = self.cells, self.rects, self.cell_size, math.floor
+        crowded = []
+        for key, x0, y0, x1, y1 in items:
+            rects[key] = (x0, y0, x1, y1)
+            shares = False
+            for cell_x in range(floor(x0 / cell_size), floor(x1 / cell_size) + 1):
+                for cell_y in range(floor(y0 / cell_size), floor(y1 / cell_size) + 1):
+                    bucket = cells.get((cell_x, cell_y))
+                    if bucket is None:
+                        cells[(cell_x, cell_y)] = {key}
+                    else:
+                        bucket.add(key)
+                        shares = True
+            if shares:
+                crowded.append(key)
+        for key in crowded:
+            for other in self.query(*rects[key], exclude=key):
+                self.link(key, other)
+
+    def remove(self, key):
+        rect = self.rects.pop(key, None)
+        if rect is None:
+            return
+        self.remove_from_cells(key, cell_range(*rect, self.cell_size))
+        for other in list(self.contacts.get(key, ())):
+            self.unlink(key, other)
+        self.changed.discard(key)
+
+    def move(self, key, delta_x, delta_y):
+        rect = self.rects.get(key)
+        if rect is None:
+            return
+        new_rect = (rect[0] + delta_x, rect[1] + delta_y, rect[2] + delta_x, rect[3] + delta_y)
+        self.rects[key] = new_rect
+        old_cells = cell_range(*rect, self.cell_size)
+        new_cells = cell_range(*new_rect, self.cell_size)
+        if old_cells != new_cells:
+            self.remove_from_cells(key, old_cells)
+            self.add_to_cells(key, new_cells)
+
+        # Only the moved key's contacts can have changed
+        old_contacts = self.contacts.get(key, set())
+        new_contacts = self.query(*new_rect, exclude=key)
+        for other in old_contacts - new_contacts:
+            self.unlink(key, other)
+        for other in new_contacts - old_contacts:
+            self.link(key, other)
+
+    def query(self, x0, y0, x1, y1, exclude=None):
+        # Keys whose rectangles overlap the given one
+        rect = (x0, y0, x1, y1)
+        found = set()
+        cx0, cy0, cx1, cy1 = cell_range(*rect, self.cell_size)
+        for cell_x in range(cx0, cx1 + 1):
+            for cell_y in range(cy0, cy1 + 1):
+                for key in self.cells.get((cell_x, cell_y), ()):
+                    if key != exclude and key not in found and overlaps(rect, self.rects[key]):
+                        found.add(key)
+        return found
+
+    def take_changed(self):
+        changed, self.changed = self.changed, set()
+        return changed
+
+    def add_to_cells(self, key, cells):
+        cx0, cy0, cx1, cy1 = cells
+        for cell_x in range(cx0, cx1 + 1):
+            for cell_y in range(cy0, cy1 + 1):
+                self.cells.setdefault((cell_x, cell_y), set()).add(key)
+
+    def remove_from_cells(self, key, cells):
+        cx0, cy0, cx1, cy1 = cells
+        for cell_x in range(cx0, cx1 + 1):
+            for cell_y in range(cy0, cy1 + 1):
+                bucket = self.cells[(cell_x, cell_y)]
+                bucket.discard(key)
+                if not bucket:
+                    del self.cells[(cell_x, cell_y)]
+
+    def link(self, a, b):
+        for key, other in ((a, b), (b, a)):
+            contacts = self.contacts.get(key)
+            if contacts is None:
+                contacts = self.contacts[key] = set()
+                self.changed.add(key)
+            contacts.add(other)
+
+    def unlink(self, a, b):
+        for key, other in ((a, b), (b, a)):
+            contacts = self.contacts[key]
+            contacts.discard(other)
+            if not contacts:
+                del self.contacts[key]
+                self.changed.add(key)
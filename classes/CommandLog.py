@@ -0,0 +1,88 @@
+# CommandLog.py
+from collections import deque
+
+
+# Undo/redo history of model edits. Each entry is a small delta built from ids, not canvas
+# state:
+#   ("add", buildings, connections)     buildings: ((id, name, x, y, first_node, resource, purity), ...)
+#   ("remove", buildings, connections)  connections: ((start_node, end_node, mk), ...)
+#   ("move", ids, dx, dy)
+#   ("miner", id, (old resource, old purity), (new resource, new purity))
+#   ("belt", start_node, old mk, new mk)
+# Building and node ids are never reused for anything else, so a delta stays valid when the
+# buildings it names are removed and added back. Entries are costed by their size and the
+# oldest are evicted once the total goes over max_cost.
+class CommandLog:
+    def __init__(self, max_cost=200000):
+        self.max_cost = max_cost
+        self.undo_entries = deque()  # (entry, cost), oldest first
+        self.redo_entries = []
+        self.cost = 0  # Total cost of both stacks
+        self.merging = False  # Whether the newest move may still grow
+
+    def __len__(self):
+        return len(self.undo_entries)
+
+    @staticmethod
+    def entry_cost(entry):
+        kind = entry[0]
+        if kind in ("add", "remove"):
+            return 1 + len(entry[1]) + len(entry[2])
+        if kind == "move":
+            return 1 + len(entry[1])
+        return 1
+
+    def record(self, entry):
+        # A new edit makes the undone entries unreachable
+        self.merging = False
+        for _, cost in self.redo_entries:
+            self.cost -= cost
+        self.redo_entries.clear()
+        self.push(entry)
+
+        # Evict the oldest entries, always keeping the newest
+        while self.cost > self.max_cost and len(self.undo_entries) > 1:
+            _, cost = self.undo_entries.popleft()
+            self.cost -= cost
+
+    def record_move(self, ids, delta_x, delta_y):
+        # Frames of one drag fold into a single move until seal() is called
+        if self.merging and self.undo_entries:
+            (kind, last_ids, last_x, last_y), cost = self.undo_entries[-1]
+            if kind == "move" and last_ids == ids:
+                self.undo_entries[-1] = (("move", ids, last_x + delta_x, last_y + delta_y), cost)
+                return
+        self.record(("move", ids, delta_x, delta_y))
+        self.merging = True
+
+    def seal(self):
+        self.merging = False
+
+    def push(self, entry):
+        cost = self.entry_cost(entry)
+        self.undo_entries.append((entry, cost))
+        self.cost += cost
+
+    def undo(self):
+        # The entry to revert, or None; it moves to the redo stack
+        self.merging = False
+        if not self.undo_entries:
+            return None
+        entry, cost = self.undo_entries.pop()
+        self.redo_entries.append((entry, cost))
+        return entry
+
+    def redo(self):
+        # The entry to apply again, or None
+        self.merging = False
+        if not self.redo_entries:
+            return None
+        entry, cost = self.redo_entries.pop()
+        self.undo_entries.append((entry, cost))
+        return entry
+
+    def clear(self):
+        self.undo_entries.clear()
+        self.redo_entries.clear()
+        self.cost = 0
+        self.merging = False
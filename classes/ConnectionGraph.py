@@ -0,0 +1,115 @@
+# ConnectionGraph.py
+
+BELT_CAPACITIES = {"I": 60, "II": 120, "III": 270, "IV": 480, "V": 780, "VI": 1200}  # Items/min per belt mark
+BELT_MARKS = tuple(BELT_CAPACITIES)
+
+
+class Connection:
+    def __init__(self, start_node, end_node, mk="I"):
+        self.start_node = start_node
+        self.end_node = end_node
+        self.mk = mk
+        self.path = ()  # World points the belt bends at, from auto-routing; straight when empty
+        self.line_id = None  # Canvas items, only while the belt is drawn
+        self.label_id = None
+
+    def nodes(self):
+        return self.start_node, self.end_node
+
+    @property
+    def capacity(self):
+        return BELT_CAPACITIES.get(self.mk)
+
+
+# Belts between snapping points, indexed by node, building and line id so that drags,
+# clicks and deletes only touch the belts attached to the building involved
+class ConnectionGraph:
+    def __init__(self):
+        self.node_owner = {}  # node -> (building, node_type)
+        self.building_nodes = {}  # building -> [node, ...]
+        self.node_connection = {}  # node -> Connection (a port carries at most one belt)
+        self.building_connections = {}  # building -> set of Connection
+        self.connections = {}  # Connection -> None, in insertion order
+        self.line_connection = {}  # line_id -> Connection, for drawn belts
+
+    def __iter__(self):
+        return iter(list(self.connections))
+
+    def __len__(self):
+        return len(self.connections)
+
+    def add_building(self, building, nodes):
+        # Register the snapping points of a building, given as (node, node_type) pairs
+        self.building_nodes[building] = [node for node, _ in nodes]
+        self.building_connections[building] = set()
+        for node, node_type in nodes:
+            self.node_owner[node] = (building, node_type)
+
+    def remove_building(self, building):
+        # Drop a building and every belt attached to it, returning the removed connections
+        removed = list(self.building_connections.get(building, ()))
+        for connection in removed:
+            self.remove_connection(connection)
+        for node in self.building_nodes.pop(building, ()):
+            self.node_owner.pop(node, None)
+        self.building_connections.pop(building, None)
+        return removed
+
+    def add_connection(self, start_node, end_node, mk="I"):
+        connection = Connection(start_node, end_node, mk)
+        self.connections[connection] = None
+        for node in connection.nodes():
+            self.node_connection[node] = connection
+            building = self.building_of(node)
+            if building is not None:
+                self.building_connections[building].add(connection)
+        return connection
+
+    def remove_connection(self, connection):
+        if connection not in self.connections:
+            return False
+        del self.connections[connection]
+        if connection.line_id is not None:
+            self.line_connection.pop(connection.line_id, None)
+        for node in connection.nodes():
+            self.node_connection.pop(node, None)
+            building = self.building_of(node)
+            if building is not None:
+                self.building_connections[building].discard(connection)
+        return True
+
+    def set_line(self, connection, line_id, label_id):
+        # Record the canvas items currently drawing a belt, or None once they are deleted
+        if connection.line_id is not None:
+            self.line_connection.pop(connection.line_id, None)
+        connection.line_id = line_id
+        connection.label_id = label_id
+        if line_id is not None:
+            self.line_connection[line_id] = connection
+
+    def is_connected(self, node):
+        return node in self.node_connection
+
+    def building_of(self, node):
+        owner = self.node_owner.get(node)
+        return owner[0] if owner else None
+
+    def node_type(self, node):
+        owner = self.node_owner.get(node)
+        return owner[1] if owner else None
+
+    def endpoints(self, connection):
+        # (source building, target building), oriented from the output node to the input node
+        start, end = self.building_of(connection.start_node), self.building_of(connection.end_node)
+        if self.node_type(connection.start_node) == "input":
+            return end, start
+        return start, end
+
+    def connection_for_line(self, line_id):
+        return self.line_connection.get(line_id)
+
+    def connection_for_node(self, node):
+        return self.node_connection.get(node)
+
+    def connections_for_building(self, building):
+        return self.building_connections.get(building, ())
@@ -0,0 +1,116 @@
+# FactoryModel.py
+from classes.CollisionIndex import CollisionIndex, find_overlaps
+from classes.SpatialIndex import SpatialIndex
+
+
+class BuildingRecord:
+    __slots__ = ("id", "name", "width", "height", "x", "y", "ports", "first_node", "output_rate", "resource", "purity")
+
+    def __init__(self, building_id, name, width, height, x, y, ports, first_node):
+        self.id = building_id
+        self.name = name
+        self.width = width
+        self.height = height
+        self.x = x
+        self.y = y
+        self.ports = ports  # ((x offset, y offset, node_type), ...), shared with the BuildingType
+        self.first_node = first_node  # Snapping point i has node id first_node + i
+        self.output_rate = 0  # Items/min this building produces on its own (set for miners)
+        self.resource = None  # Mined resource and node purity, for miners
+        self.purity = None
+
+    def nodes(self):
+        return range(self.first_node, self.first_node + len(self.ports))
+
+    def rect(self):
+        return self.x, self.y, self.x + self.width, self.y + self.height
+
+    def snapping_points(self):
+        # [(node, node_type), ...]
+        return [(self.first_node + index, port[2]) for index, port in enumerate(self.ports)]
+
+    def port_positions(self):
+        # Yield (node, x, y, node_type) for every snapping point
+        for index, (cx, cy, node_type) in enumerate(self.ports):
+            yield self.first_node + index, self.x + cx, self.y + cy, node_type
+
+
+# Geometry and port layout of every building, with no Tk dependency. Records are small
+# __slots__ objects keyed by building id, snapping point positions are kept in a SpatialIndex
+# and footprints in a CollisionIndex, so headless tools can place, move and query buildings,
+# and find the ones that overlap, without a canvas.
+class FactoryModel:
+    def __init__(self, snap_cell_size, collision_cell_size=None):
+        self.buildings = {}  # id -> BuildingRecord
+        self.next_id = 1
+        self.next_node = 1
+        self.snap_index = SpatialIndex(snap_cell_size)  # node -> centre, data (record, node_type)
+        self.collisions = CollisionIndex(collision_cell_size or 2 * snap_cell_size)  # building id -> footprint
+
+    def __len__(self):
+        return len(self.buildings)
+
+    def __iter__(self):
+        return iter(self.buildings.values())
+
+    def add_building(self, building_type, x, y, building_id=None, first_node=None):
+        # Place a BuildingType from the catalog; its precompiled port offsets are shared, not copied.
+        # building_id and first_node restore a removed building under its old ids (see CommandLog).
+        ports = building_type.ports
+        if building_id is None:
+            building_id, first_node = self.next_id, self.next_node
+        record = BuildingRecord(building_id, building_type.name, building_type.width, building_type.height, x, y, ports, first_node)
+        self.buildings[record.id] = record
+        self.next_id = max(self.next_id, building_id + 1)
+        self.next_node = max(self.next_node, first_node + len(ports))
+
+        for node, snap_x, snap_y, node_type in record.port_positions():
+            self.snap_index.insert(node, snap_x, snap_y, (record, node_type))
+        self.collisions.insert(record.id, *record.rect())
+        return record
+
+    def add_buildings(self, placements):
+        # add_building for many (building type, x, y) at once, with new ids handed out in order.
+        # The snapping points and footprints go into their indexes in one bulk pass each.
+        records = []
+        buildings = self.buildings
+        building_id, node = self.next_id, self.next_node
+        for building_type, x, y in placements:
+            record = BuildingRecord(building_id, building_type.name, building_type.width, building_type.height, x, y, building_type.ports, node)
+            buildings[building_id] = record
+            records.append(record)
+            building_id += 1
+            node += len(building_type.ports)
+        self.next_id, self.next_node = building_id, node
+
+        self.snap_index.insert_many(
+            (record.first_node + index, record.x + cx, record.y + cy, (record, node_type))
+            for record in records for index, (cx, cy, node_type) in enumerate(record.ports)
+        )
+        self.collisions.insert_many((record.id, record.x, record.y, record.x + record.width, record.y + record.height) for record in records)
+        return records
+
+    def add_blueprint(self, blueprint, x, y):
+        # Place every building of a Blueprint with its origin at (x, y). Node ids are handed out
+        # in order, so the stamp's belts connect first_node + the blueprint's node offsets.
+        first_node = self.next_node
+        records = self.add_buildings((building_type, x + dx, y + dy) for building_type, dx, dy, _, _ in blueprint.placements)
+        return records, first_node
+
+    def remove_building(self, record):
+        del self.buildings[record.id]
+        for node in record.nodes():
+            self.snap_index.remove(node)
+        self.collisions.remove(record.id)
+
+    def move_building(self, record, delta_x, delta_y):
+        record.x += delta_x
+        record.y += delta_y
+        for node, snap_x, snap_y, _ in record.port_positions():
+            self.snap_index.move(node, snap_x, snap_y)
+        self.collisions.move(record.id, delta_x, delta_y)
+
+    def overlaps(self):
+        # Every pair of overlapping buildings, found from scratch in one bucketing pass
+        records = list(self.buildings.values())
+        return [(records[i], records[j]) for i, j in find_overlaps([record.rect() for record in records])]
@@ -0,0 +1,296 @@
+# FlowSolver.py
+import time
+
+EPSILON = 1e-9
+UNCHANGED = object()  # Default of set_node_rates for rates the caller leaves as they are
+
+
+class FlowNode:
+    def __init__(self, supply=0.0, capacity=None):
+        self.supply = supply  # Items/min produced on its own (miners, extractors)
+        self.capacity = capacity  # Max items/min it can pass on, None for unlimited
+        self.in_edges = []
+        self.out_edges = []
+
+
+class FlowEdge:
+    def __init__(self, source, target, capacity=None):
+        self.source = source
+        self.target = target
+        self.capacity = capacity  # Max items/min on the belt, None for unlimited
+
+
+class FlowResult:
+    def __init__(self):
+        self.inflow = {}  # node -> items/min arriving on belts
+        self.throughput = {}  # node -> items/min actually passed on or consumed
+        self.belt_flow = {}  # edge -> items/min
+        self.unsettled = set()  # Nodes of loops that did not settle within max_iterations
+
+
+class UpdateStats:
+    def __init__(self, nodes, changed_edges, elapsed, changed_nodes=()):
+        self.nodes = nodes  # Number of nodes recomputed
+        self.changed_edges = changed_edges  # Edges whose flow changed
+        self.changed_nodes = changed_nodes  # Nodes whose inflow changed
+        self.elapsed = elapsed  # Seconds spent
+
+    def __repr__(self):
+        return f"UpdateStats(nodes={self.nodes}, changed_edges={len(self.changed_edges)}, elapsed={self.elapsed * 1000:.2f}ms)"
+
+
+# Steady-state throughput of a building chain, independent of Tk. Nodes and edges are keyed
+# by any hashable id, so the same solver runs on planner Buildings or on saved layouts.
+# Each node forwards min(supply + inflow, capacity) and splits it evenly over its outgoing
+# belts, spilling over to the others when a belt is full. The graph is condensed into
+# strongly connected components and solved in topological order, so acyclic chains cost
+# O(nodes + belts); loops are settled with Gauss-Seidel sweeps over their component only.
+# Edits mark the nodes they touch as dirty and update() re-solves only what lies downstream
+# of them, reusing the cached flows of every untouched subgraph.
+class FlowSolver:
+    max_iterations = 200
+
+    def __init__(self):
+        self.nodes = {}
+        self.edges = {}
+        self.result = FlowResult()
+        self.dirty = set()  # Nodes whose inputs or settings changed since the last solve
+        self.changed_edges = set()  # Edges whose flow changed during the current solve
+        self.changed_nodes = set()  # Nodes whose inflow changed during the current solve
+
+    def add_node(self, node_id, supply=0.0, capacity=None):
+        self.nodes[node_id] = FlowNode(supply, capacity)
+        self.dirty.add(node_id)
+
+    def set_node_rates(self, node_id, supply=UNCHANGED, capacity=UNCHANGED):
+        node = self.nodes[node_id]
+        if supply is not UNCHANGED:
+            node.supply = supply
+        if capacity is not UNCHANGED:
+            node.capacity = capacity
+        self.dirty.add(node_id)
+
+    def remove_node(self, node_id):
+        node = self.nodes[node_id]
+        for edge_id in node.in_edges + node.out_edges:
+            self.remove_edge(edge_id)
+        del self.nodes[node_id]
+        self.dirty.discard(node_id)
+        self.result.inflow.pop(node_id, None)
+        self.result.throughput.pop(node_id, None)
+        self.result.unsettled.discard(node_id)
+
+    def add_edge(self, edge_id, source, target, capacity=None):
+        self.edges[edge_id] = FlowEdge(source, target, capacity)
+        self.nodes[source].out_edges.append(edge_id)
+        self.nodes[target].in_edges.append(edge_id)
+        # The source re-splits its output, which reaches the target through the new edge
+        self.dirty.add(source)
+
+    def set_edge_capacity(self, edge_id, capacity=None):
+        edge = self.edges[edge_id]
+        edge.capacity = capacity
+        self.dirty.add(edge.source)
+
+    def remove_edge(self, edge_id):
+        edge = self.edges.pop(edge_id, None)
+        if edge is None:
+            return
+        self.nodes[edge.source].out_edges.remove(edge_id)
+        self.nodes[edge.target].in_edges.remove(edge_id)
+        self.result.belt_flow.pop(edge_id, None)
+        self.dirty.add(edge.source)
+        self.dirty.add(edge.target)
+
+    def solve(self):
+        # Full solve from scratch
+        self.result = FlowResult()
+        self.dirty.clear()
+        self.changed_edges = set()
+        self.changed_nodes = set()
+        for component in self.components(self.nodes):
+            self.solve_component(component)
+        return self.result
+
+    def update(self):
+        # Re-solve only the nodes downstream of dirty ones and report what it cost
+        started = time.perf_counter()
+        if self.dirty and len(self.dirty) >= len(self.nodes):
+            # Everything is dirty, e.g. after a load, so skip the region search and the checks
+            self.solve()
+            return UpdateStats(len(self.nodes), self.changed_edges, time.perf_counter() - started, self.changed_nodes)
+        seeds = set(self.dirty)
+        region = self.downstream(seeds)
+        self.dirty.clear()
+        self.changed_edges = set()
+        self.changed_nodes = set()
+        recomputed = 0
+        for component in self.components(region):
+            # Skip components whose inputs came through the edit unchanged
+            if self.needs_update(component, seeds):
+                self.solve_component(component)
+                recomputed += len(component)
+        return UpdateStats(recomputed, self.changed_edges, time.perf_counter() - started, self.changed_nodes)
+
+    def needs_update(self, component, seeds):
+        for node_id in component:
+            if node_id in seeds:
+                return True
+            for edge_id in self.nodes[node_id].in_edges:
+                if edge_id in self.changed_edges:
+                    return True
+        return False
+
+    def downstream(self, node_ids):
+        # Every node reachable from node_ids, including themselves
+        region = set(node_id for node_id in node_ids if node_id in self.nodes)
+        pending = list(region)
+        while pending:
+            node_id = pending.pop()
+            for edge_id in self.nodes[node_id].out_edges:
+                target = self.edges[edge_id].target
+                if target not in region:
+                    region.add(target)
+                    pending.append(target)
+        return region
+
+    def bottlenecks(self):
+        # Nodes that receive more than they can pass on, and belts running at capacity
+        result = self.result
+        nodes = [
+            node_id for node_id, node in self.nodes.items()
+            if node.supply + result.inflow.get(node_id, 0.0) - result.throughput.get(node_id, 0.0) > EPSILON
+        ]
+        edges = [
+            edge_id for edge_id, edge in self.edges.items()
+            if edge.capacity is not None and edge.capacity - result.belt_flow.get(edge_id, 0.0) <= EPSILON
+        ]
+        return nodes, edges
+
+    def idle_capacity(self):
+        # Unused items/min for every node with a capacity limit
+        return {
+            node_id: max(node.capacity - self.result.throughput.get(node_id, 0.0), 0.0)
+            for node_id, node in self.nodes.items()
+            if node.capacity is not None
+        }
+
+    def solve_component(self, component):
+        unsettled = self.result.unsettled
+        unsettled.difference_update(component)
+        if len(component) == 1 and not self.has_self_loop(component[0]):
+            self.evaluate(component[0])
+            return
+
+        # A loop: sweep until flows settle. One without enough capacity limits to hold its
+        # supply keeps growing; its nodes are flagged rather than trusted.
+        for node_id in component:
+            for edge_id in self.nodes[node_id].out_edges:
+                self.result.belt_flow.setdefault(edge_id, 0.0)
+        for _ in range(self.max_iterations):
+            change = 0.0
+            for node_id in component:
+                change = max(change, self.evaluate(node_id))
+            if change <= EPSILON:
+                break
+        else:
+            unsettled.update(component)
+
+    def has_self_loop(self, node_id):
+        return any(self.edges[edge_id].target == node_id for edge_id in self.nodes[node_id].out_edges)
+
+    def evaluate(self, node_id):
+        # Recompute a node from the current flow on its input belts, returning the largest change
+        node = self.nodes[node_id]
+        belt_flow = self.result.belt_flow
+        inflow = sum(belt_flow.get(edge_id, 0.0) for edge_id in node.in_edges)
+        available = node.supply + inflow
+        throughput = available if node.capacity is None else min(available, node.capacity)
+
+        change = 0.0
+        if node.out_edges:
+            shares = self.distribute(throughput, [self.edges[edge_id].capacity for edge_id in node.out_edges])
+            throughput = sum(shares)
+            for edge_id, share in zip(node.out_edges, shares):
+                edge_change = abs(belt_flow.get(edge_id, 0.0) - share)
+                if edge_change > EPSILON or edge_id not in belt_flow:
+                    self.changed_edges.add(edge_id)
+                change = max(change, edge_change)
+                belt_flow[edge_id] = share
+
+        if abs(self.result.inflow.get(node_id, -1.0) - inflow) > EPSILON:
+            self.changed_nodes.add(node_id)
+        self.result.inflow[node_id] = inflow
+        self.result.throughput[node_id] = throughput
+        return change
+
+    @staticmethod
+    def distribute(amount, capacities):
+        # Split evenly, handing the share of full belts to the remaining ones
+        shares = [0.0] * len(capacities)
+        order = sorted(range(len(capacities)), key=lambda i: float('inf') if capacities[i] is None else capacities[i])
+        remaining = amount
+        for position, index in enumerate(order):
+            share = remaining / (len(order) - position)
+            if capacities[index] is not None:
+                share = min(share, capacities[index])
+            shares[index] = share
+            remaining -= share
+        return shares
+
+    def components(self, node_ids):
+        # Strongly connected components of the subgraph on node_ids, in topological order (iterative Tarjan)
+        node_ids = node_ids if isinstance(node_ids, (set, dict)) else set(node_ids)
+        index_of, lowlink = {}, {}
+        on_stack, stack, components = set(), [], []
+        counter = 0
+
+        for root in node_ids:
+            if root in index_of:
+                continue
+            work = [(root, iter(self.successors(root, node_ids)))]
+            index_of[root] = lowlink[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack.add(root)
+
+            while work:
+                node_id, successors = work[-1]
+                advanced = False
+                for successor in successors:
+                    if successor not in index_of:
+                        index_of[successor] = lowlink[successor] = counter
+                        counter += 1
+                        stack.append(successor)
+                        on_stack.add(successor)
+                        work.append((successor, iter(self.successors(successor, node_ids))))
+                        advanced = True
+                        break
+                    if successor in on_stack:
+                        lowlink[node_id] = min(lowlink[node_id], index_of[successor])
+                if advanced:
+                    continue
+
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node_id])
+                if lowlink[node_id] == index_of[node_id]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node_id:
+                            break
+                    components.append(component)
+
+        # Tarjan emits components in reverse topological order
+        components.reverse()
+        return components
+
+    def successors(self, node_id, node_ids):
+        for edge_id in self.nodes[node_id].out_edges:
+            target = self.edges[edge_id].target
+            if target in node_ids:
+                yield target
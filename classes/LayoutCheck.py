@@ -0,0 +1,184 @@
+# LayoutCheck.py
+import json
+from classes.BuildingCatalog import BuildingCatalog
+from classes.CollisionIndex import find_overlaps
+from classes.ConnectionGraph import BELT_CAPACITIES
+from classes.FlowSolver import FlowSolver, EPSILON
+from classes.LayoutFile import load_layout
+from classes.LogisticsSimulation import LogisticsSimulation
+from classes.PowerGrid import PowerGrid, format_mw
+from classes.ProductionPlanner import building_input_rates
+
+
+class LayoutReport:
+    def __init__(self, path=None):
+        self.path = path
+        self.buildings = 0
+        self.connections = 0
+        self.unknown_types = {}  # name -> count
+        self.free_inputs = 0  # Snapping points without a belt
+        self.free_outputs = 0
+        self.problems = []  # Belts that break the rules the planner enforces when connecting
+        self.supply = 0.0  # Items/min mined
+        self.delivered = 0.0  # Items/min reaching buildings with no outgoing belts
+        self.bottlenecks = 0  # Buildings receiving more than they can pass on
+        self.saturated_belts = 0  # Belts running at their mark's capacity
+        self.overlaps = 0  # Pairs of buildings placed on top of each other
+        self.power = PowerGrid()  # Power budget with generators fuelled by the solved flow
+        self.simulation = None  # SimulationResult of the splitter/merger network, when simulated
+        self.error = None  # Why the file could not be read
+
+    @property
+    def ok(self):
+        return self.error is None and not self.problems and not self.unknown_types
+
+    def summary(self):
+        if self.error is not None:
+            return f"{self.path}: ERROR {self.error}"
+        status = "ok" if self.ok else "FAIL"
+        lines = [
+            f"{self.path}: {status} - {self.buildings} buildings, {self.connections} belts, "
+            f"{self.free_inputs} free inputs, {self.free_outputs} free outputs, "
+            f"{self.supply:g}/min mined, {self.delivered:g}/min delivered, {self.bottlenecks} bottlenecks, {self.saturated_belts} saturated belts"
+        ]
+        power = self.power
+        if power.consumption or power.capacity:
+            line = f"  power {format_mw(power.generation)}/{format_mw(power.capacity)} MW generated, {format_mw(power.consumption)} MW used"
+            if power.deficit:
+                line += f", {format_mw(power.deficit)} MW short"
+            if power.starved:
+                line += f", {len(power.starved)} generators short of fuel"
+            lines.append(line)
+        if self.simulation is not None:
+            lines.append(f"  logistics {'settle' if self.simulation.steady else 'still changing'} after {self.simulation.minutes:g} min, "
+                         f"{len(self.simulation.saturated_at)} belts back up, {sum(self.simulation.blocked.values()):g}/min blocked")
+        for name, count in self.unknown_types.items():
+            lines.append(f"  unknown building type {name} ({count})")
+        lines.extend(f"  {problem}" for problem in self.problems)
+        return "\n".join(lines)
+
+
+def check_layout(layout, catalog, solid_resources, path=None, simulate=False, input_rates=None):
+    # Validate a Layout against the catalog and summarise its throughput, without Tk.
+    # input_rates (building type -> items/min, see building_input_rates) caps what machines pass on.
+    input_rates = input_rates or {}
+    report = LayoutReport(path)
+    kinds = {}  # building index -> type name
+    report.buildings = len(layout)
+    report.connections = layout.connection_count()
+
+    ports = []  # building index -> port layout, or None for unknown types
+    rects = []  # Footprints of the known buildings
+    rect_buildings = []  # rects index -> building index
+    flow = FlowSolver()
+    for index in range(len(layout)):
+        name, x, y, resource, purity = layout.building(index)
+        building_type = catalog.get(name)
+        if building_type is None:
+            report.unknown_types[name] = report.unknown_types.get(name, 0) + 1
+            ports.append(None)
+            continue
+        ports.append(building_type.ports)
+        rects.append((x, y, x + building_type.width, y + building_type.height))
+        report.power.add_building(index, building_type)
+        rect_buildings.append(index)
+        kinds[index] = name
+
+        supply = 0.0
+        if resource is not None and purity is not None:
+            supply = solid_resources.get(resource, {}).get(f"{purity.lower()}_rate", 0)
+        report.supply += supply
+        flow.add_node(index, supply=supply, capacity=input_rates.get(name))
+
+    pairs = find_overlaps(rects)
+    report.overlaps = len(pairs)
+    if pairs:
+        first, second = pairs[0]
+        report.problems.append(f"{len(pairs)} overlapping building pairs, e.g. buildings {rect_buildings[first]} and {rect_buildings[second]}")
+
+    used = set()
+    for index in range(layout.connection_count()):
+        start_building, start_port, end_building, end_port, mk = layout.connection(index)
+        if mk not in BELT_CAPACITIES:
+            report.problems.append(f"belt {index}: unknown belt mark {mk}")
+        ends = []
+        for building, port in ((start_building, start_port), (end_building, end_port)):
+            if building >= len(ports):
+                report.problems.append(f"belt {index}: building {building} does not exist")
+            elif ports[building] is None:
+                pass  # Already reported as an unknown type
+            elif port >= len(ports[building]):
+                report.problems.append(f"belt {index}: building {building} has no port {port}")
+            else:
+                ends.append((building, port, ports[building][port][2]))
+        if len(ends) < 2:
+            continue
+
+        (start_building, start_port, start_type), (end_building, end_port, end_type) = ends
+        if start_building == end_building:
+            report.problems.append(f"belt {index}: connects building {start_building} to itself")
+        elif start_type == end_type:
+            report.problems.append(f"belt {index}: connects two {start_type}s")
+        for building, port, _ in ends:
+            if (building, port) in used:
+                report.problems.append(f"belt {index}: port {port} of building {building} already has a belt")
+            used.add((building, port))
+        if start_building != end_building and start_type != end_type:
+            source, target = (start_building, end_building) if start_type == "output" else (end_building, start_building)
+            flow.add_edge(index, source, target, BELT_CAPACITIES.get(mk))
+
+    for building, building_ports in enumerate(ports):
+        if building_ports is None:
+            continue
+        for port, (_, _, port_type) in enumerate(building_ports):
+            if (building, port) not in used:
+                if port_type == "input":
+                    report.free_inputs += 1
+                else:
+                    report.free_outputs += 1
+
+    flow.solve()
+    if flow.result.unsettled:
+        report.problems.append(f"{len(flow.result.unsettled)} buildings in belt loops whose flow grows without bound")
+    for node_id, node in flow.nodes.items():
+        if not node.out_edges:
+            report.delivered += flow.result.inflow.get(node_id, 0.0)
+    for index in report.power.generators:
+        report.power.set_fuel_input(index, flow.result.inflow.get(index, 0.0))
+    bottleneck_nodes, saturated_edges = flow.bottlenecks()
+    report.bottlenecks = len(bottleneck_nodes)
+    report.saturated_belts = len(saturated_edges)
+    if report.delivered < EPSILON:
+        report.delivered = 0.0
+    if simulate:
+        demands = {index: input_rates.get(name) for index, name in kinds.items()}
+        report.simulation = LogisticsSimulation.from_flow(flow, kinds, demands).run()
+    return report
+
+
+# Per-process state for check_path, set up once per worker by init_worker
+catalog = None
+solid_resources = None
+simulate = False
+input_rates = None
+
+
+def init_worker(building_types_path='building_types.json', resources_path='solid_resources.json', simulate_logistics=False, recipes_path='recipes.json'):
+    global catalog, solid_resources, simulate, input_rates
+    catalog = BuildingCatalog.load(building_types_path)
+    simulate = simulate_logistics
+    with open(resources_path, 'r') as f:
+        solid_resources = json.load(f)["solid_resources"]
+    with open(recipes_path, 'r') as f:
+        input_rates = building_input_rates(json.load(f)["recipes"], catalog)
+
+
+def check_path(path):
+    # Any failure becomes this file's error, so one bad layout never ends a batch or a worker pool
+    try:
+        layout = load_layout(path)
+        return check_layout(layout, catalog, solid_resources, path, simulate, input_rates)
+    except Exception as error:
+        report = LayoutReport(path)
+        report.error = f"{type(error).__name__}: {error}"
+        return report
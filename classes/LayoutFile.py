@@ -0,0 +1,163 @@
+# LayoutFile.py
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+
+MAGIC = b"FPLN"
+VERSION = 1
+HEADER = struct.Struct("<4sHHIII")  # magic, version, reserved, buildings, connections, string table bytes
+PURITIES = (None, "Impure", "Normal", "Pure")  # Stored as their index
+
+# (attribute, array typecode) in file order
+BUILDING_COLUMNS = (
+    ("type_ids", "H"),  # String table index of the building type
+    ("resource_ids", "h"),  # String table index of the mined resource, -1 for none
+    ("purities", "B"),  # Index into PURITIES
+    ("xs", "f"),
+    ("ys", "f"),
+)
+CONNECTION_COLUMNS = (
+    ("start_buildings", "I"),  # Building index of the start node
+    ("start_ports", "B"),  # Snapping point index within that building
+    ("end_buildings", "I"),
+    ("end_ports", "B"),
+    ("mk_ids", "H"),  # String table index of the belt mark
+)
+
+
+# Columnar, Tk-free copy of a factory layout. Buildings and connections are stored as
+# parallel arrays; connection endpoints refer to buildings by index and to their snapping
+# points by position, so a layout can be inspected without creating any canvas items.
+class Layout:
+    def __init__(self):
+        self.names = []  # String table: building types, resources and belt marks
+        self.name_ids = {}
+        for attribute, typecode in BUILDING_COLUMNS + CONNECTION_COLUMNS:
+            setattr(self, attribute, array(typecode))
+
+    def __len__(self):
+        return len(self.type_ids)
+
+    def connection_count(self):
+        return len(self.start_buildings)
+
+    def name_id(self, name):
+        if name not in self.name_ids:
+            self.name_ids[name] = len(self.names)
+            self.names.append(name)
+        return self.name_ids[name]
+
+    def add_building(self, name, x, y, resource=None, purity=None):
+        self.type_ids.append(self.name_id(name))
+        self.resource_ids.append(-1 if resource is None else self.name_id(resource))
+        self.purities.append(PURITIES.index(purity) if purity in PURITIES else 0)  # Unknown purities are stored as None
+        self.xs.append(x)
+        self.ys.append(y)
+        return len(self.type_ids) - 1
+
+    def add_connection(self, start_building, start_port, end_building, end_port, mk="I"):
+        self.start_buildings.append(start_building)
+        self.start_ports.append(start_port)
+        self.end_buildings.append(end_building)
+        self.end_ports.append(end_port)
+        self.mk_ids.append(self.name_id(mk))
+
+    def building(self, index):
+        # (name, x, y, resource, purity) of one building
+        resource_id = self.resource_ids[index]
+        return (
+            self.names[self.type_ids[index]],
+            self.xs[index],
+            self.ys[index],
+            None if resource_id < 0 else self.names[resource_id],
+            PURITIES[self.purities[index]],
+        )
+
+    def connection(self, index):
+        # (start building, start port, end building, end port, mk) of one connection
+        return (
+            self.start_buildings[index],
+            self.start_ports[index],
+            self.end_buildings[index],
+            self.end_ports[index],
+            self.names[self.mk_ids[index]],
+        )
+
+
+def padding(size):
+    # Columns start on 8-byte boundaries so they can be cast straight out of a memory map
+    return -size % 8
+
+
+def save_layout(path, layout):
+    # Written beside the target and renamed over it, so an interrupted save leaves the old file
+    strings = "\0".join(layout.names).encode("utf-8")
+    f = tempfile.NamedTemporaryFile("wb", dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp", delete=False)
+    try:
+        with f:
+            f.write(HEADER.pack(MAGIC, VERSION, 0, len(layout), layout.connection_count(), len(strings)))
+            f.write(strings + b"\0" * padding(HEADER.size + len(strings)))
+            for attribute, _ in BUILDING_COLUMNS + CONNECTION_COLUMNS:
+                column = getattr(layout, attribute)
+                if sys.byteorder == "big":
+                    column = array(column.typecode, column)
+                    column.byteswap()
+                data = column.tobytes()
+                f.write(data + b"\0" * padding(len(data)))
+        os.replace(f.name, path)
+    except BaseException:
+        os.remove(f.name)
+        raise
+
+
+def load_layout(path, use_mmap=True):
+    # Columns are memoryviews over a read-only memory map unless use_mmap is False
+    with open(path, "rb") as f:
+        if use_mmap and os.fstat(f.fileno()).st_size:  # Empty files cannot be mapped
+            data = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        else:
+            data = memoryview(f.read())
+
+    if len(data) < HEADER.size:
+        raise ValueError(f"{path} is truncated")
+    magic, version, _, building_count, connection_count, strings_size = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a factory layout")
+    if version != VERSION:
+        raise ValueError(f"Unsupported layout version {version}")
+
+    layout = Layout()
+    offset = HEADER.size
+    if offset + strings_size > len(data):
+        raise ValueError(f"{path} is truncated")
+    strings = bytes(data[offset:offset + strings_size]).decode("utf-8")
+    layout.names = strings.split("\0") if strings_size else []
+    if "" in layout.names:
+        raise ValueError(f"{path} has a damaged string table")
+    layout.name_ids = {name: index for index, name in enumerate(layout.names)}
+    offset += strings_size + padding(offset + strings_size)
+
+    for columns, count in ((BUILDING_COLUMNS, building_count), (CONNECTION_COLUMNS, connection_count)):
+        for attribute, typecode in columns:
+            size = count * array(typecode).itemsize
+            if offset + size > len(data):
+                raise ValueError(f"{path} is truncated")
+            column = data[offset:offset + size].cast(typecode)
+            if sys.byteorder == "big":
+                column = array(typecode, column)
+                column.byteswap()
+            setattr(layout, attribute, column)
+            offset += size + padding(size)
+
+    # Indexes past the string table or the buildings would otherwise only fail on first use
+    bounds = (("type_ids", len(layout.names)), ("resource_ids", len(layout.names)), ("purities", len(PURITIES)),
+              ("start_buildings", building_count), ("end_buildings", building_count), ("mk_ids", len(layout.names)))
+    for attribute, bound in bounds:
+        column = getattr(layout, attribute)
+        if len(column) and max(column) >= bound:
+            raise ValueError(f"{path} has {attribute} out of range")
+
+    return layout
@@ -0,0 +1,174 @@
+# LogisticsSimulation.py
+from array import array
+from classes.FlowSolver import FlowSolver, EPSILON
+
+LOGISTICS = ("Splitter", "Merger")  # Building types simulated as balancers
+
+
+class SimulationResult:
+    def __init__(self):
+        self.minutes = 0.0  # Simulated time until steady state, or until the limit
+        self.steady = False  # Whether flows stopped changing before the limit
+        self.belt_rates = {}  # edge -> items/min leaving the belt in the last tick
+        self.node_rates = {}  # node -> items/min passed on (balancers) or taken in (machines)
+        self.blocked = {}  # node -> items/min of supply that found no room on its belts
+        self.saturated_at = {}  # edge -> minute the belt first filled up or backed up into its source
+
+    def __repr__(self):
+        state = "steady" if self.steady else "not steady"
+        return f"SimulationResult({state} after {self.minutes:g} min, {len(self.saturated_at)} saturated belts)"
+
+    def split(self, edges):
+        # Steady-state share of each given belt, e.g. the outputs of one splitter
+        total = sum(self.belt_rates.get(edge, 0.0) for edge in edges)
+        return {edge: (self.belt_rates.get(edge, 0.0) / total if total > EPSILON else 0.0) for edge in edges}
+
+
+# Discrete-time model of splitter and merger networks with back-pressure. Every belt is a
+# buffer holding capacity * belt_minutes items that moves at most capacity * tick items per
+# tick. Balancers (splitters and mergers) pass on min(what their inputs offer, what their
+# outputs accept), pulling evenly from inputs and pushing evenly to outputs with the share of
+# full belts spilling to the others, so a full belt backs up into everything feeding it.
+# Machines pull up to their demand and push what they pulled plus their own supply. All nodes
+# update synchronously from the state at the start of the tick, over flat per-belt arrays and
+# CSR adjacency.
+class LogisticsSimulation:
+    def __init__(self, tick=1 / 60, belt_minutes=0.05):
+        self.tick = tick  # Minutes per step
+        self.belt_minutes = belt_minutes  # Items a belt holds, in minutes of its capacity
+        self.node_ids = []
+        self.node_index = {}
+        self.balancer = []  # Per node: True for splitters and mergers
+        self.supply = []  # Per node: items/min pushed out (machines)
+        self.demand = []  # Per node: items/min pulled in, None for no limit (machines)
+        self.edge_ids = []
+        self.edge_ends = []  # (source index, target index)
+        self.capacity = array("d")  # Per belt: items/min, inf when unlimited
+
+    def add_node(self, node_id, balancer=False, supply=0.0, demand=None):
+        self.node_index[node_id] = len(self.node_ids)
+        self.node_ids.append(node_id)
+        self.balancer.append(balancer)
+        self.supply.append(supply)
+        self.demand.append(demand)
+
+    def add_belt(self, edge_id, source, target, capacity=None):
+        self.edge_ids.append(edge_id)
+        self.edge_ends.append((self.node_index[source], self.node_index[target]))
+        self.capacity.append(float("inf") if capacity is None else capacity)
+
+    @classmethod
+    def from_flow(cls, flow, kinds, demands=None, **settings):
+        # Build from a FlowSolver graph; kinds maps node -> building type name. Nodes that are not
+        # splitters or mergers push their own supply and take in up to demands.get(node).
+        demands = demands or {}
+        simulation = cls(**settings)
+        for node_id, node in flow.nodes.items():
+            balancer = kinds.get(node_id) in LOGISTICS
+            simulation.add_node(node_id, balancer, 0.0 if balancer else node.supply, demands.get(node_id))
+        for edge_id, edge in flow.edges.items():
+            simulation.add_belt(edge_id, edge.source, edge.target, edge.capacity)
+        return simulation
+
+    def adjacency(self, column):
+        # CSR offsets and belt indexes grouped by node, column 0 for outputs and 1 for inputs
+        counts = [0] * (len(self.node_ids) + 1)
+        for ends in self.edge_ends:
+            counts[ends[column] + 1] += 1
+        for index in range(len(self.node_ids)):
+            counts[index + 1] += counts[index]
+        belts = array("l", bytes(array("l").itemsize * len(self.edge_ends)))
+        fill = counts[:-1]
+        for belt, ends in enumerate(self.edge_ends):
+            belts[fill[ends[column]]] = belt
+            fill[ends[column]] += 1
+        return counts, belts
+
+    @staticmethod
+    def distribute(amount, capacities):
+        # FlowSolver.distribute, skipping the sort for the common one-belt case
+        if len(capacities) == 1:
+            return [min(amount, capacities[0])]
+        return FlowSolver.distribute(amount, capacities)
+
+    def run(self, max_minutes=60.0, tolerance=1e-6):
+        # Step until contents and flows stop changing or max_minutes have been simulated
+        tick = self.tick
+        belt_count = len(self.edge_ids)
+        out_offsets, out_belts = self.adjacency(0)
+        in_offsets, in_belts = self.adjacency(1)
+        node_inputs = [in_belts[in_offsets[node]:in_offsets[node + 1]].tolist() for node in range(len(self.node_ids))]
+        node_outputs = [out_belts[out_offsets[node]:out_offsets[node + 1]].tolist() for node in range(len(self.node_ids))]
+        distribute = self.distribute
+        rate = array("d", (capacity * tick for capacity in self.capacity))  # Items per tick
+        limit = array("d", (capacity * self.belt_minutes for capacity in self.capacity))  # Items held when full
+        content = array("d", bytes(8 * belt_count))
+        moved = array("d", bytes(8 * belt_count))
+        node_moved = [0.0] * len(self.node_ids)
+        blocked = [0.0] * len(self.node_ids)
+        result = SimulationResult()
+
+        steps = int(max_minutes / tick)
+        for step in range(1, steps + 1):
+            # What every belt can give and take, from the state at the start of the tick
+            offer = [min(content[belt], rate[belt]) for belt in range(belt_count)]
+            room = [min(rate[belt], limit[belt] - content[belt]) for belt in range(belt_count)]
+            pulled = [0.0] * belt_count
+            pushed = [0.0] * belt_count
+
+            for node, (inputs, outputs) in enumerate(zip(node_inputs, node_outputs)):
+                if self.balancer[node]:
+                    wanted = sum(offer[belt] for belt in inputs)
+                    amount = min(wanted, sum(room[belt] for belt in outputs))
+                    take = amount
+                    give = amount
+                else:
+                    # Machines pass on their own supply plus what they take in, up to their demand as
+                    # FlowSolver.evaluate does, and take in no more than their output belts have room for
+                    supply = self.supply[node] * tick
+                    demand = self.demand[node]
+                    available = sum(offer[belt] for belt in inputs)
+                    take = available if demand is None else min(available, max(demand * tick - supply, 0.0))
+                    if outputs:
+                        wanted = supply + take
+                        take = min(take, max(sum(room[belt] for belt in outputs) - supply, 0.0))
+                        give = supply + take
+                    else:
+                        give = wanted = supply
+                if inputs:
+                    for belt, share in zip(inputs, distribute(take, [offer[belt] for belt in inputs])):
+                        pulled[belt] = share
+                if outputs:
+                    shares = distribute(give, [room[belt] for belt in outputs])
+                    for belt, share in zip(outputs, shares):
+                        pushed[belt] = share
+                    blocked[node] = (give - sum(shares)) / tick
+                    if wanted - sum(shares) > EPSILON:
+                        # More was waiting than the belts took, so the ones taking all they could are
+                        # backed up. A moving belt never fills to its limit, so this is the only sign.
+                        for belt, share in zip(outputs, shares):
+                            if share >= room[belt] - EPSILON and belt not in result.saturated_at:
+                                result.saturated_at[belt] = step * tick
+                else:
+                    blocked[node] = 0.0
+                node_moved[node] = (take if inputs else give - blocked[node] * tick) / tick
+
+            change = 0.0
+            for belt in range(belt_count):
+                new_content = content[belt] - pulled[belt] + pushed[belt]
+                change = max(change, abs(new_content - content[belt]), abs(pulled[belt] - moved[belt]))
+                content[belt] = new_content
+                moved[belt] = pulled[belt]
+                if new_content >= limit[belt] - EPSILON and belt not in result.saturated_at:
+                    result.saturated_at[belt] = step * tick
+
+            result.minutes = step * tick
+            if change <= tolerance and step > 1:
+                result.steady = True
+                break
+
+        result.belt_rates = {self.edge_ids[belt]: moved[belt] / tick for belt in range(belt_count)}
+        result.node_rates = dict(zip(self.node_ids, node_moved))
+        result.blocked = {node_id: rate for node_id, rate in zip(self.node_ids, blocked) if rate > EPSILON}
+        result.saturated_at = {self.edge_ids[belt]: minute for belt, minute in result.saturated_at.items()}
+        return result
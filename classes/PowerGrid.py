@@ -0,0 +1,89 @@
+# PowerGrid.py
+from classes.FlowSolver import EPSILON
+
+
+def format_mw(value):
+    # Two decimals hide the drift of the running sums; adding 0.0 turns a rounded -0.0 into 0
+    return f"{round(value, 2) + 0.0:g}"
+
+
+# Running power budget of one grid. Buildings are keyed by any hashable id and bring their
+# draw or output from the catalog; totals are adjusted by each add, remove and fuel change
+# instead of being summed over the factory, so every edit costs O(1). Generators burn the
+# first fuel their type lists and produce in proportion to the fuel reaching them, up to
+# their full output.
+class PowerGrid:
+    def __init__(self):
+        self.consumers = {}  # key -> MW drawn
+        self.generators = {}  # key -> (MW at full output, fuel, fuel items/min at full output)
+        self.fuel_input = {}  # generator key -> items/min arriving on its belts
+        self.output = {}  # generator key -> MW produced
+        self.starved = set()  # Generators getting less fuel than they can burn
+        self.consumption = 0.0
+        self.capacity = 0.0  # MW with every generator fully fuelled
+        self.generation = 0.0
+
+    def __repr__(self):
+        text = f"PowerGrid({format_mw(self.generation)}/{format_mw(self.capacity)} MW generated, {format_mw(self.consumption)} MW used"
+        if self.deficit:
+            text += f", {format_mw(self.deficit)} MW short"
+        if self.starved:
+            text += f", {len(self.starved)} generators short of fuel"
+        return text + ")"
+
+    @property
+    def balance(self):
+        return self.generation - self.consumption
+
+    @property
+    def deficit(self):
+        # MW the consumers draw beyond what is generated, 0 when covered
+        deficit = self.consumption - self.generation
+        return deficit if deficit > EPSILON else 0.0
+
+    def add_building(self, key, building_type):
+        if building_type.power_use:
+            self.consumers[key] = building_type.power_use
+            self.consumption += building_type.power_use
+        if building_type.power_output:
+            fuel, burn_rate = next(iter(building_type.fuels.items()))
+            self.generators[key] = (building_type.power_output, fuel, burn_rate)
+            self.capacity += building_type.power_output
+            self.fuel_input[key] = 0.0
+            self.output[key] = 0.0
+            self.starved.add(key)
+
+    def remove_building(self, key):
+        # Running float sums drift, so an emptied side starts again from exactly 0
+        if key in self.consumers:
+            self.consumption -= self.consumers.pop(key)
+            if not self.consumers:
+                self.consumption = 0.0
+        if key in self.generators:
+            self.capacity -= self.generators.pop(key)[0]
+            self.generation -= self.output.pop(key)
+            del self.fuel_input[key]
+            self.starved.discard(key)
+            if not self.generators:
+                self.capacity = 0.0
+                self.generation = 0.0
+
+    def set_fuel_input(self, key, rate):
+        # Fuel items/min now reaching a generator; ignored for other buildings
+        generator = self.generators.get(key)
+        if generator is None:
+            return
+        full_output, _, burn_rate = generator
+        output = full_output * min(rate / burn_rate, 1.0)
+        self.generation += output - self.output[key]
+        self.output[key] = output
+        self.fuel_input[key] = rate
+        if rate < burn_rate - EPSILON:
+            self.starved.add(key)
+        else:
+            self.starved.discard(key)
+
+    def fuel_needed(self, key):
+        # (fuel, extra items/min needed for full output) of a generator
+        _, fuel, burn_rate = self.generators[key]
+        return fuel, max(burn_rate - self.fuel_input[key], 0.0)
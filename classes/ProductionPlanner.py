@@ -0,0 +1,163 @@
+# ProductionPlanner.py
+import json
+import math
+
+EPSILON = 1e-9
+PURITIES = ("Pure", "Normal", "Impure")  # Preferred order when assigning miners to nodes
+MAX_CLOCK = 2.5  # Highest overclock a building accepts
+
+
+def building_input_rates(recipes, catalog=None):
+    # Items/min one building of each type takes in at 100% clock: the total input of its
+    # fastest recipe, or for generators in the catalog the burn rate of their preferred fuel.
+    # Types with neither are left out and pass on whatever reaches them.
+    rates = {}
+    for recipe in recipes.values():
+        total = sum(recipe["inputs"].values())
+        if total > 0:
+            rates[recipe["building"]] = max(rates.get(recipe["building"], 0), total)
+    if catalog is not None:
+        for building_type in catalog:
+            if building_type.fuels:
+                rates[building_type.name] = next(iter(building_type.fuels.values()))
+    return rates
+
+
+class ProductionPlan:
+    def __init__(self, target):
+        self.target = target  # item -> items/min requested
+        self.item_rates = {}  # item -> items/min produced by the chain, intermediates included
+        self.buildings = {}  # recipe -> (building name, count, clock)
+        self.miners = []  # (resource, purity, count, clock)
+        self.raw = {}  # raw item -> items/min consumed
+        self.byproducts = {}  # item -> items/min produced on the side
+        self.shortfall = {}  # resource -> items/min the available nodes cannot cover
+
+    def building_counts(self):
+        counts = {}
+        for building, count, _ in self.buildings.values():
+            counts[building] = counts.get(building, 0) + count
+        for _, _, count, _ in self.miners:
+            counts["Miner"] = counts.get("Miner", 0) + count
+        return counts
+
+
+# Turns "N items/min of X" into building counts, clock speeds and miner node assignments.
+# The recipe chain is the linear system x = d + A x, where A[j][i] is how much of item j one
+# unit of item i consumes. Its solution columns (I - A)^-1 e_i are compiled once by
+# back-substitution in topological order and stored sparsely, so every query, and every
+# target in a batch, is just a weighted sum of precomputed columns.
+class ProductionPlanner:
+    def __init__(self, recipes, solid_resources, building_types=None):
+        self.recipes = recipes
+        self.solid_resources = solid_resources
+        self.producer = {}  # item -> name of the recipe whose first output it is
+        self.columns = {}  # item -> {item: units needed per unit of the key item, itself included}
+
+        known_buildings = None
+        if building_types is not None:
+            known_buildings = {name for category in building_types.values() for name in category}
+
+        for name, recipe in recipes.items():
+            if known_buildings is not None and recipe["building"] not in known_buildings:
+                raise ValueError(f"Recipe {name} uses unknown building {recipe['building']}")
+            if not recipe["outputs"]:
+                raise ValueError(f"Recipe {name} has no outputs")
+            main_output = next(iter(recipe["outputs"]))
+            self.producer.setdefault(main_output, name)
+
+        for item in self.producer:
+            self.column(item, ())
+
+    @classmethod
+    def from_files(cls, recipes_path='recipes.json', resources_path='solid_resources.json', building_types_path='building_types.json'):
+        with open(recipes_path, 'r') as f:
+            recipes = json.load(f)["recipes"]
+        with open(resources_path, 'r') as f:
+            solid_resources = json.load(f)["solid_resources"]
+        with open(building_types_path, 'r') as f:
+            building_types = json.load(f)["buildings"]
+        return cls(recipes, solid_resources, building_types)
+
+    def column(self, item, path):
+        # Total items needed per unit of `item`, memoised; raw items only need themselves
+        if item in self.columns:
+            return self.columns[item]
+        if item in path:
+            raise ValueError(f"Recipe cycle through {item}")
+
+        column = {item: 1.0}
+        recipe_name = self.producer.get(item)
+        if recipe_name is not None:
+            recipe = self.recipes[recipe_name]
+            output_rate = recipe["outputs"][item]
+            for ingredient, input_rate in recipe["inputs"].items():
+                weight = input_rate / output_rate
+                for needed, amount in self.column(ingredient, path + (item,)).items():
+                    column[needed] = column.get(needed, 0.0) + weight * amount
+        self.columns[item] = column
+        return column
+
+    def item_rates(self, target):
+        rates = {}
+        for item, rate in target.items():
+            for needed, amount in self.column(item, ()).items():
+                rates[needed] = rates.get(needed, 0.0) + rate * amount
+        return rates
+
+    def plan(self, target, max_clock=1.0, available_nodes=None):
+        # target: item -> items/min; available_nodes: resource -> {purity: node count},
+        # resources left out of it (or available_nodes=None) get as many pure nodes as needed
+        if not 0 < max_clock <= MAX_CLOCK:
+            raise ValueError(f"Clock speed must be within (0, {MAX_CLOCK}]")
+
+        plan = ProductionPlan(target)
+        plan.item_rates = self.item_rates(target)
+
+        for item, rate in plan.item_rates.items():
+            if rate <= EPSILON:
+                continue
+            recipe_name = self.producer.get(item)
+            if recipe_name is None:
+                plan.raw[item] = rate
+                continue
+
+            recipe = self.recipes[recipe_name]
+            machines = rate / recipe["outputs"][item]
+            count = math.ceil(machines / max_clock - EPSILON)
+            plan.buildings[recipe_name] = (recipe["building"], count, machines / count)
+
+            for byproduct, byproduct_rate in recipe["outputs"].items():
+                if byproduct != item:
+                    plan.byproducts[byproduct] = plan.byproducts.get(byproduct, 0.0) + machines * byproduct_rate
+
+        for resource, rate in plan.raw.items():
+            if resource in self.solid_resources:
+                nodes = None if available_nodes is None else available_nodes.get(resource)
+                self.assign_miners(plan, resource, rate, max_clock, nodes)
+
+        return plan
+
+    def plan_many(self, targets, max_clock=1.0, available_nodes=None):
+        # Plan a batch of target mixes against the same compiled recipe columns
+        return [self.plan(target, max_clock, available_nodes) for target in targets]
+
+    def assign_miners(self, plan, resource, rate, max_clock, nodes):
+        # Fill the best nodes first, each miner running at up to max_clock
+        remaining = rate
+        for purity in PURITIES:
+            if remaining <= EPSILON:
+                break
+            base_rate = self.solid_resources[resource].get(f"{purity.lower()}_rate", 0)
+            if base_rate <= 0:
+                continue
+            needed = math.ceil(remaining / (base_rate * max_clock) - EPSILON)
+            count = needed if nodes is None else min(needed, nodes.get(purity, 0))
+            if count <= 0:
+                continue
+            clock = remaining / (count * base_rate) if count == needed else max_clock
+            plan.miners.append((resource, purity, count, clock))
+            remaining -= count * base_rate * clock
+
+        if remaining > EPSILON:
+            plan.shortfall[resource] = remaining
@@ -0,0 +1,153 @@
+# SpatialIndex.py
+import math
+
+# Uniform grid over canvas coordinates. Each cell holds the keys of the points inside it,
+# so nearest-point queries only look at the cells around the query position instead of
+# every snapping point in the factory, and never need to ask Tk for coordinates.
+class SpatialIndex:
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.cells = {}  # (cell_x, cell_y) -> set of keys
+        self.points = {}  # key -> (x, y, data)
+        self.bounds = None  # (min_cell_x, min_cell_y, max_cell_x, max_cell_y) ever occupied
+
+    def __len__(self):
+        return len(self.points)
+
+    def __contains__(self, key):
+        return key in self.points
+
+    def cell_of(self, x, y):
+        return math.floor(x / self.cell_size), math.floor(y / self.cell_size)
+
+    def insert(self, key, x, y, data=None):
+        if key in self.points:
+            self.remove(key)
+        cell = (math.floor(x / self.cell_size), math.floor(y / self.cell_size))
+        bucket = self.cells.get(cell)
+        if bucket is None:
+            bucket = self.cells[cell] = set()
+        bucket.add(key)
+        self.points[key] = (x, y, data)
+        bounds = self.bounds
+        # Loading inserts many points per cell; only the first one outside the bounds grows them
+        if bounds is None or not (bounds[0] <= cell[0] <= bounds[2] and bounds[1] <= cell[1] <= bounds[3]):
+            self.grow_bounds(cell)
+
+    def insert_many(self, items):
+        # Bulk insert of (key, x, y, data) for keys not in the index yet, growing the bounds once
+        cells, points, cell_size, floor = self.cells, self.points, self.cell_size, math.floor
+        columns, rows = set(), set()
+        for key, x, y, data in items:
+            cell = (floor(x / cell_size), floor(y / cell_size))
+            bucket = cells.get(cell)
+            if bucket is None:
+                bucket = cells[cell] = set()
+                columns.add(cell[0])
+                rows.add(cell[1])
+            bucket.add(key)
+            points[key] = (x, y, data)
+        if columns:
+            self.grow_bounds((min(columns), min(rows)))
+            self.grow_bounds((max(columns), max(rows)))
+
+    def remove(self, key):
+        entry = self.points.pop(key, None)
+        if entry is None:
+            return
+        cell = self.cell_of(entry[0], entry[1])
+        bucket = self.cells.get(cell)
+        if bucket is not None:
+            bucket.discard(key)
+            if not bucket:
+                del self.cells[cell]
+
+    def move(self, key, x, y):
+        entry = self.points.get(key)
+        if entry is None:
+            return
+        old_cell = self.cell_of(entry[0], entry[1])
+        new_cell = self.cell_of(x, y)
+        if old_cell != new_cell:
+            bucket = self.cells[old_cell]
+            bucket.discard(key)
+            if not bucket:
+                del self.cells[old_cell]
+            self.cells.setdefault(new_cell, set()).add(key)
+            self.grow_bounds(new_cell)
+        self.points[key] = (x, y, entry[2])
+
+    def position(self, key):
+        entry = self.points.get(key)
+        return (entry[0], entry[1]) if entry else None
+
+    def data(self, key):
+        entry = self.points.get(key)
+        return entry[2] if entry else None
+
+    def grow_bounds(self, cell):
+        if self.bounds is None:
+            self.bounds = (cell[0], cell[1], cell[0], cell[1])
+        else:
+            min_x, min_y, max_x, max_y = self.bounds
+            self.bounds = (min(min_x, cell[0]), min(min_y, cell[1]), max(max_x, cell[0]), max(max_y, cell[1]))
+
+    def ring(self, cx, cy, radius):
+        # Cells at exactly `radius` Chebyshev distance from (cx, cy)
+        if radius == 0:
+            yield cx, cy
+            return
+        for dx in range(-radius, radius + 1):
+            yield cx + dx, cy - radius
+            yield cx + dx, cy + radius
+        for dy in range(-radius + 1, radius):
+            yield cx - radius, cy + dy
+            yield cx + radius, cy + dy
+
+    def nearest(self, x, y, accept=None, max_distance=float('inf')):
+        # Return (key, data, distance) for the closest point accepted by accept(key, data), or None
+        if not self.points:
+            return None
+
+        cx, cy = self.cell_of(x, y)
+        min_x, min_y, max_x, max_y = self.bounds
+        max_radius = max(cx - min_x, max_x - cx, cy - min_y, max_y - cy, 0)
+        # Rings closer than this lie entirely outside the occupied area
+        start_radius = max(min_x - cx, cx - max_x, min_y - cy, cy - max_y, 0)
+
+        best_key, best_data, best_distance = None, None, max_distance
+        for radius in range(start_radius, max_radius + 1):
+            # Every cell in this ring is at least (radius - 1) cells away from the query point
+            if (radius - 1) * self.cell_size > best_distance:
+                break
+            for cell in self.ring(cx, cy, radius):
+                bucket = self.cells.get(cell)
+                if not bucket:
+                    continue
+                for key in bucket:
+                    px, py, data = self.points[key]
+                    distance = math.hypot(px - x, py - y)
+                    if distance < best_distance and (accept is None or accept(key, data)):
+                        best_key, best_data, best_distance = key, data, distance
+
+        if best_key is None:
+            return None
+        return best_key, best_data, best_distance
+
+    def query_rect(self, x0, y0, x1, y1):
+        # Keys of all points inside the axis-aligned rectangle
+        if self.bounds is None:
+            return []
+        cx0, cy0 = self.cell_of(x0, y0)
+        cx1, cy1 = self.cell_of(x1, y1)
+        min_x, min_y, max_x, max_y = self.bounds
+        cx0, cy0 = max(cx0, min_x), max(cy0, min_y)
+        cx1, cy1 = min(cx1, max_x), min(cy1, max_y)
+        found = []
+        for cell_x in range(cx0, cx1 + 1):
+            for cell_y in range(cy0, cy1 + 1):
+                for key in self.cells.get((cell_x, cell_y), ()):
+                    px, py, _ = self.points[key]
+                    if x0 <= px <= x1 and y0 <= py <= y1:
+                        found.append(key)
+        return found
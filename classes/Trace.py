@@ -0,0 +1,98 @@
+# Trace.py
+import functools
+import logging
+import time
+
+
+# Structured events and timings from the planner's hot paths. Hooks are called as
+# hook(event, fields) with a dotted event name and a dict of values. Call sites check
+# `trace.enabled` before building any fields, so with no hooks installed an event costs one
+# attribute test, and instrument() only wraps methods while something is listening.
+class Trace:
+    def __init__(self):
+        self.hooks = []
+        self.enabled = False
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+        self.enabled = True
+
+    def remove_hook(self, hook):
+        self.hooks.remove(hook)
+        self.enabled = bool(self.hooks)
+
+    def emit(self, event, **fields):
+        for hook in self.hooks:
+            hook(event, fields)
+
+    def span(self, event, **fields):
+        # Context manager that emits event with its elapsed seconds when the block ends
+        return Span(self, event, fields)
+
+    def instrument(self, target, names):
+        # Time calls to the named methods of one instance as "call.<name>" events, until uninstrument()
+        for name in names:
+            method = getattr(target, name)
+
+            @functools.wraps(method)
+            def timed(*args, method=method, event=f"call.{name}", **kwargs):
+                started = time.perf_counter()
+                try:
+                    return method(*args, **kwargs)
+                finally:
+                    self.emit(event, elapsed=time.perf_counter() - started)
+
+            setattr(target, name, timed)
+
+    @staticmethod
+    def uninstrument(target, names):
+        for name in names:
+            target.__dict__.pop(name, None)
+
+
+class Span:
+    __slots__ = ("trace", "event", "fields", "started")
+
+    def __init__(self, trace, event, fields):
+        self.trace = trace
+        self.event = event
+        self.fields = fields
+        self.started = 0.0
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.trace.emit(self.event, elapsed=time.perf_counter() - self.started, **self.fields)
+        return False
+
+
+class TimingHook:
+    # Count, total and worst elapsed seconds per timed event; events without elapsed are skipped
+    def __init__(self):
+        self.stats = {}  # event -> [count, total seconds, max seconds]
+
+    def __call__(self, event, fields):
+        elapsed = fields.get("elapsed")
+        if elapsed is None:
+            return
+        entry = self.stats.get(event)
+        if entry is None:
+            self.stats[event] = [1, elapsed, elapsed]
+        else:
+            entry[0] += 1
+            entry[1] += elapsed
+            entry[2] = max(entry[2], elapsed)
+
+    def clear(self):
+        self.stats.clear()
+
+
+def log_hook(event, fields, logger=logging.getLogger("factory_planner")):
+    # One log line per event, e.g. "building.spawned name=Smelter id=3"
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("%s %s", event, " ".join(f"{key}={value}" for key, value in fields.items()))
+
+
+trace = Trace()  # Shared by the planner and the tools
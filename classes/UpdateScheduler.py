@@ -0,0 +1,36 @@
+# UpdateScheduler.py
+import time
+
+# Runs deferred canvas work at most once per frame. Callers schedule a callback under a key;
+# scheduling the same key again before the frame is flushed replaces the earlier callback,
+# so a burst of motion events turns into one redraw per object per frame.
+class UpdateScheduler:
+    frame_ms = 16  # About 60 flushes per second
+
+    def __init__(self, widget):
+        self.widget = widget
+        self.pending = {}  # key -> callback
+        self.scheduled = None
+        self.last_flush = 0.0
+
+    def schedule(self, key, callback):
+        self.pending[key] = callback
+        if self.scheduled is None:
+            elapsed_ms = (time.perf_counter() - self.last_flush) * 1000
+            if elapsed_ms >= self.frame_ms:
+                self.scheduled = self.widget.after_idle(self.flush)
+            else:
+                self.scheduled = self.widget.after(int(self.frame_ms - elapsed_ms), self.flush)
+
+    def flush(self):
+        self.scheduled = None
+        self.last_flush = time.perf_counter()
+        pending, self.pending = self.pending, {}
+        for callback in pending.values():
+            callback()
+
+    def flush_key(self, key):
+        # Run one pending callback right away, e.g. before a drag is released
+        callback = self.pending.pop(key, None)
+        if callback is not None:
+            callback()
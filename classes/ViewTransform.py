@@ -0,0 +1,31 @@
+# ViewTransform.py
+
+# Maps world coordinates (where buildings live and snap to the grid) to canvas coordinates:
+# canvas = world * scale + offset. Zooming rescales every canvas item with one
+# canvas.scale("all", ...) call and folds the same change into the transform, so items
+# created afterwards line up with the ones that were already scaled.
+class ViewTransform:
+    min_scale = 0.05
+    max_scale = 4.0
+
+    def __init__(self):
+        self.scale = 1.0
+        self.offset_x = 0.0
+        self.offset_y = 0.0
+
+    def to_canvas(self, x, y):
+        return x * self.scale + self.offset_x, y * self.scale + self.offset_y
+
+    def to_world(self, x, y):
+        return (x - self.offset_x) / self.scale, (y - self.offset_y) / self.scale
+
+    def clamp_factor(self, factor):
+        # Limit a zoom factor so the resulting scale stays within bounds
+        new_scale = min(max(self.scale * factor, self.min_scale), self.max_scale)
+        return new_scale / self.scale
+
+    def zoom(self, factor, center_x, center_y):
+        # Apply the same change as canvas.scale(..., center_x, center_y, factor, factor)
+        self.scale *= factor
+        self.offset_x = self.offset_x * factor + center_x * (1 - factor)
+        self.offset_y = self.offset_y * factor + center_y * (1 - factor)
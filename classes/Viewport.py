@@ -0,0 +1,207 @@
+# Viewport.py
+from classes.SpatialIndex import SpatialIndex
+
+# Render layer for the planner canvas. Buildings are kept in a spatial index by position and
+# only those overlapping the visible area (plus a margin) have canvas items; belts are drawn
+# while either of their buildings is. When zoomed out, or when too many buildings are in
+# view, labels, snapping points and belt labels are dropped so the Tk item count stays bounded.
+class Viewport:
+    margin = 200  # Canvas pixels drawn beyond each edge of the window
+    cell_size = 256
+    detail_scale = 0.5  # Below this zoom, labels and snapping points are not drawn
+    detail_limit = 1500  # Nor when more buildings than this are in view
+
+    def __init__(self, canvas, connections, snap_index, label_text_callback, transform, line_color_callback=None):
+        self.canvas = canvas
+        self.transform = transform  # ViewTransform shared with the buildings
+        self.connections = connections
+        self.snap_index = snap_index
+        self.label_text_callback = label_text_callback  # connection -> belt label text
+        self.line_color_callback = line_color_callback  # connection -> belt colour
+        self.index = SpatialIndex(self.cell_size)  # building -> top-left corner
+        self.max_width = 0
+        self.max_height = 0
+        self.shown = set()
+        self.drawn = set()  # Connections with canvas items
+        self.detailed = True
+        self.update_pending = False
+
+    def visible_region(self):
+        # Visible area in world coordinates, grown by the margin
+        x0, y0 = self.transform.to_world(self.canvas.canvasx(0) - self.margin, self.canvas.canvasy(0) - self.margin)
+        x1, y1 = self.transform.to_world(
+            self.canvas.canvasx(self.canvas.winfo_width()) + self.margin,
+            self.canvas.canvasy(self.canvas.winfo_height()) + self.margin
+        )
+        return x0, y0, x1, y1
+
+    def buildings_in(self, x0, y0, x1, y1):
+        found = set()
+        for building in self.index.query_rect(x0 - self.max_width, y0 - self.max_height, x1, y1):
+            if building.x + building.width >= x0 and building.y + building.height >= y0:
+                found.add(building)
+        return found
+
+    def is_visible(self, building):
+        x0, y0, x1, y1 = self.visible_region()
+        return (building.x <= x1 and building.y <= y1
+                and building.x + building.width >= x0 and building.y + building.height >= y0)
+
+    def request_update(self):
+        # Coalesce pan, scroll and resize events into one update per idle pass
+        if not self.update_pending:
+            self.update_pending = True
+            self.canvas.after_idle(self.update)
+
+    def update(self):
+        self.update_pending = False
+        visible = self.buildings_in(*self.visible_region())
+        detailed = self.transform.scale >= self.detail_scale and len(visible) <= self.detail_limit
+
+        for building in self.shown - visible:
+            building.hide()
+        leaving = self.shown - visible
+        self.shown &= visible
+
+        if detailed != self.detailed:
+            self.detailed = detailed
+            for building in self.shown:
+                building.set_detail(detailed)
+            for connection in self.drawn:
+                self.set_connection_detail(connection)
+
+        for building in visible - self.shown:
+            building.show(detailed)
+            self.shown.add(building)
+            for connection in self.connections.connections_for_building(building):
+                self.draw_connection(connection)
+
+        for building in leaving:
+            for connection in self.connections.connections_for_building(building):
+                if not any(self.connections.building_of(node) in self.shown for node in connection.nodes()):
+                    self.erase_connection(connection)
+
+    def add_building(self, building):
+        self.index.insert(building, building.x, building.y)
+        self.max_width = max(self.max_width, building.width)
+        self.max_height = max(self.max_height, building.height)
+        if self.is_visible(building):
+            building.show(self.detailed)
+            self.shown.add(building)
+
+    def add_buildings(self, buildings):
+        # Index a batch, then draw the visible ones and their belts in one pass
+        x0, y0, x1, y1 = self.visible_region()
+        records = [building.record for building in buildings]
+        self.index.insert_many((building, record.x, record.y, None) for building, record in zip(buildings, records))
+        self.max_width = max(self.max_width, max((record.width for record in records), default=0))
+        self.max_height = max(self.max_height, max((record.height for record in records), default=0))
+        for building, record in zip(buildings, records):
+            if record.x <= x1 and record.y <= y1 and record.x + record.width >= x0 and record.y + record.height >= y0:
+                building.show(self.detailed)
+                self.shown.add(building)
+                for connection in self.connections.connections_for_building(building):
+                    self.draw_connection(connection)
+
+    def remove_building(self, building, connections=()):
+        # Forget a building and erase the given belts that were attached to it
+        self.remove_buildings((building,), connections)
+
+    def remove_buildings(self, buildings, connections=()):
+        for building in buildings:
+            building.hide()
+            self.index.remove(building)
+            self.shown.discard(building)
+        for connection in connections:
+            self.erase_connection(connection)
+
+    def move_buildings(self, buildings):
+        # Re-index a moved group, then redraw each attached belt once even if both ends moved
+        moved = set()
+        for building in buildings:
+            self.index.move(building, building.x, building.y)
+            moved.update(self.connections.connections_for_building(building))
+        for connection in moved:
+            connection.path = ()  # A routed belt no longer fits once an end moves
+            if connection in self.drawn:
+                self.place_connection(connection)
+            else:
+                self.add_connection(connection)  # Drawn only if one of its ends is shown
+
+    def draw_shown_connections(self):
+        # Draw any belts of shown buildings that were added without drawing them
+        for building in self.shown:
+            for connection in self.connections.connections_for_building(building):
+                self.draw_connection(connection)
+
+    def add_connection(self, connection):
+        if any(self.connections.building_of(node) in self.shown for node in connection.nodes()):
+            self.draw_connection(connection)
+
+    def line_coords(self, connection):
+        # Flat canvas coordinates from the start node through any bends to the end node
+        points = (self.snap_index.position(connection.start_node), *connection.path, self.snap_index.position(connection.end_node))
+        coords = []
+        for x, y in points:
+            coords.extend(self.transform.to_canvas(x, y))
+        return coords
+
+    @staticmethod
+    def label_position(coords):
+        # Midpoint of the middle segment
+        middle = (len(coords) // 2 - 1) // 2 * 2
+        return (coords[middle] + coords[middle + 2]) / 2, (coords[middle + 1] + coords[middle + 3]) / 2
+
+    def draw_connection(self, connection):
+        if connection in self.drawn:
+            return
+        coords = self.line_coords(connection)
+
+        # Draw line between two snapping points with increased thickness
+        line_id = self.canvas.create_line(*coords, fill=self.line_color(connection), width=4, tags=("belt",))
+        self.connections.set_line(connection, line_id, None)
+        self.drawn.add(connection)
+        self.set_connection_detail(connection)
+
+    def set_connection_detail(self, connection):
+        # Create or drop the belt label to match the detail level
+        if self.detailed and connection.label_id is None:
+            mid_x, mid_y = self.label_position(self.line_coords(connection))
+            label_id = self.canvas.create_text(mid_x, mid_y, text=self.label_text_callback(connection), fill="black")
+            self.connections.set_line(connection, connection.line_id, label_id)
+        elif not self.detailed and connection.label_id is not None:
+            self.canvas.delete(connection.label_id)
+            self.connections.set_line(connection, connection.line_id, None)
+
+    def line_color(self, connection):
+        return self.line_color_callback(connection) if self.line_color_callback else "green"
+
+    def recolor(self, connections):
+        # Refresh the colour of the given belts that are drawn, sent to Tk as a single script
+        path = str(self.canvas)
+        script = "\n".join(
+            f"{path} itemconfigure {connection.line_id} -fill {self.line_color(connection)}"
+            for connection in connections if connection in self.drawn
+        )
+        if script:
+            self.canvas.tk.eval(script)
+
+    def place_connection(self, connection):
+        coords = self.line_coords(connection)
+        self.canvas.coords(connection.line_id, *coords)
+
+        # Update the label position
+        if connection.label_id is not None:
+            self.canvas.coords(connection.label_id, *self.label_position(coords))
+
+    def erase_connection(self, connection):
+        if connection not in self.drawn:
+            return
+        self.drawn.discard(connection)
+        self.canvas.delete(connection.line_id)
+        if connection.label_id is not None:
+            self.canvas.delete(connection.label_id)
+        if connection in self.connections.connections:
+            self.connections.set_line(connection, None, None)
+        else:
+            connection.line_id = connection.label_id = None
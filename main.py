@@ -1,5 +1,15 @@
+import argparse
+import logging
 from FactoryPlanner import FactoryPlanner
+from classes.Trace import trace, log_hook
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Plan factories on a grid.")
+    parser.add_argument("-q", "--quiet", action="store_true", help="Do not log edits to the console")
+    args = parser.parse_args()
+    if not args.quiet:
+        logging.basicConfig(level=logging.INFO, format="%(message)s")
+        trace.add_hook(log_hook)
+
     app = FactoryPlanner()
     app.mainloop()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The planner is run from the repository root, where `classes` is importable
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
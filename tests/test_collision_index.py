@@ -0,0 +1,72 @@
+import random
+
+from classes.CollisionIndex import CollisionIndex, find_overlaps, overlaps
+
+
+def random_rect(rng):
+    x, y = rng.randrange(0, 400, 10), rng.randrange(0, 400, 10)
+    return x, y, x + rng.randrange(10, 60, 10), y + rng.randrange(10, 60, 10)
+
+
+def brute_force(rects):
+    # key -> keys it overlaps, only for keys that overlap something
+    contacts = {}
+    keys = list(rects)
+    for position, a in enumerate(keys):
+        for b in keys[position + 1:]:
+            if overlaps(rects[a], rects[b]):
+                contacts.setdefault(a, set()).add(b)
+                contacts.setdefault(b, set()).add(a)
+    return contacts
+
+
+def test_find_overlaps_matches_brute_force():
+    rng = random.Random(1)
+    rects = [random_rect(rng) for _ in range(300)]
+    expected = {(i, j) for i in range(len(rects)) for j in range(i + 1, len(rects)) if overlaps(rects[i], rects[j])}
+    for cell_size in (None, 7, 25, 100):
+        pairs = find_overlaps(rects, cell_size)
+        assert len(pairs) == len(set(pairs))
+        assert set(pairs) == expected
+
+
+def test_edges_touching_do_not_overlap():
+    assert not overlaps((0, 0, 10, 10), (10, 0, 20, 10))
+    assert find_overlaps([(0, 0, 10, 10), (0, 10, 10, 20)]) == []
+
+
+def test_index_matches_brute_force_through_edits():
+    rng = random.Random(2)
+    index = CollisionIndex(cell_size=40)
+    rects = {}
+    for step in range(2000):
+        kind = rng.randrange(3)
+        key = rng.randrange(150)
+        if kind == 0:
+            rects[key] = random_rect(rng)
+            index.insert(key, *rects[key])
+        elif kind == 1 and key in rects:
+            delta_x, delta_y = rng.randrange(-50, 60, 10), rng.randrange(-50, 60, 10)
+            x0, y0, x1, y1 = rects[key]
+            rects[key] = (x0 + delta_x, y0 + delta_y, x1 + delta_x, y1 + delta_y)
+            index.move(key, delta_x, delta_y)
+        else:
+            rects.pop(key, None)
+            index.remove(key)
+        if step % 50 == 0:
+            assert index.contacts == brute_force(rects)
+    assert index.rects == rects
+    assert index.contacts == brute_force(rects)
+    assert {key for key in rects if index.is_colliding(key)} == set(brute_force(rects))
+
+
+def test_insert_many_matches_single_inserts():
+    rng = random.Random(3)
+    rects = {key: random_rect(rng) for key in range(500)}
+    bulk = CollisionIndex(cell_size=40)
+    bulk.insert_many((key, *rect) for key, rect in rects.items())
+    single = CollisionIndex(cell_size=40)
+    for key, rect in rects.items():
+        single.insert(key, *rect)
+    assert bulk.cells == single.cells
+    assert bulk.contacts == single.contacts == brute_force(rects)
@@ -0,0 +1,78 @@
+import random
+
+import pytest
+from classes.FlowSolver import FlowSolver
+
+
+def random_graph(rng, nodes, edges, loops):
+    flow = FlowSolver()
+    for node in range(nodes):
+        flow.add_node(node, supply=rng.choice((0.0, 0.0, 30.0, 60.0)), capacity=rng.choice((None, 15.0, 45.0)))
+    for edge in range(edges):
+        source, target = rng.sample(range(nodes), 2)
+        if not loops and source > target:
+            source, target = target, source
+        flow.add_edge(edge, source, target, rng.choice((None, 60.0, 120.0)))
+    return flow
+
+
+def edit(rng, flow, next_edge, loops):
+    # One random edit of the kinds the planner makes
+    nodes = list(flow.nodes)
+    kind = rng.randrange(4)
+    if kind == 0:
+        flow.set_node_rates(rng.choice(nodes), supply=rng.choice((0.0, 30.0, 90.0)))
+    elif kind == 1:
+        flow.set_node_rates(rng.choice(nodes), capacity=rng.choice((None, 15.0, 30.0)))
+    elif kind == 2 and flow.edges:
+        edge = rng.choice(list(flow.edges))
+        if rng.random() < 0.5:
+            flow.remove_edge(edge)
+        else:
+            flow.set_edge_capacity(edge, rng.choice((None, 60.0)))
+    else:
+        source, target = rng.sample(nodes, 2)
+        if not loops and source > target:
+            source, target = target, source
+        flow.add_edge(next_edge, source, target, 60.0)
+
+
+def fresh_solve(flow):
+    # The same graph solved from scratch by a new solver
+    copy = FlowSolver()
+    for node_id, node in flow.nodes.items():
+        copy.add_node(node_id, node.supply, node.capacity)
+    for edge_id, edge in flow.edges.items():
+        copy.add_edge(edge_id, edge.source, edge.target, edge.capacity)
+    return copy.solve()
+
+
+@pytest.mark.parametrize("loops", [False, True])
+@pytest.mark.parametrize("seed", range(5))
+def test_update_matches_full_solve(seed, loops):
+    rng = random.Random(seed)
+    flow = random_graph(rng, 40, 70, loops)
+    flow.solve()
+    for step in range(60):
+        edit(rng, flow, 1000 + step, loops)
+        flow.update()
+        expected = fresh_solve(flow)
+        assert flow.result.belt_flow == pytest.approx(expected.belt_flow, abs=1e-6)
+        assert flow.result.inflow == pytest.approx(expected.inflow, abs=1e-6)
+        assert flow.result.throughput == pytest.approx(expected.throughput, abs=1e-6)
+        assert flow.result.unsettled == expected.unsettled
+
+
+def test_update_skips_untouched_chains():
+    flow = FlowSolver()
+    for chain in ("a", "b"):
+        flow.add_node((chain, 0), supply=60.0)
+        for step in range(1, 10):
+            flow.add_node((chain, step), capacity=30.0)
+            flow.add_edge((chain, step), (chain, step - 1), (chain, step))
+    flow.solve()
+    flow.set_node_rates(("a", 0), supply=20.0)
+    stats = flow.update()
+    assert stats.nodes == 10
+    assert flow.result.inflow[("a", 9)] == pytest.approx(20.0)
+    assert flow.result.inflow[("b", 9)] == pytest.approx(30.0)
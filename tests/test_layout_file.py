@@ -0,0 +1,59 @@
+import pytest
+from classes.LayoutFile import Layout, save_layout, load_layout
+
+
+@pytest.fixture
+def layout():
+    layout = Layout()
+    layout.add_building("Miner", 0, 0, "Iron Ore", "Pure")
+    layout.add_building("Smelter", 90.5, -18, None, None)
+    layout.add_building("Constructor", 180, 0, "Iron Ore", "unknown")
+    layout.add_connection(0, 0, 1, 1, "II")
+    layout.add_connection(1, 0, 2, 1)
+    return layout
+
+
+@pytest.mark.parametrize("use_mmap", [True, False])
+def test_round_trip(tmp_path, layout, use_mmap):
+    path = tmp_path / "factory.fpl"
+    save_layout(path, layout)
+    loaded = load_layout(path, use_mmap)
+    assert len(loaded) == len(layout)
+    assert loaded.connection_count() == layout.connection_count()
+    assert [loaded.building(index) for index in range(len(loaded))] == [layout.building(index) for index in range(len(layout))]
+    assert [loaded.connection(index) for index in range(loaded.connection_count())] == [layout.connection(index) for index in range(layout.connection_count())]
+
+
+def test_unknown_purity_is_stored_as_none(layout):
+    assert layout.building(2)[4] is None
+
+
+def test_empty_layout(tmp_path):
+    path = tmp_path / "empty.fpl"
+    save_layout(path, Layout())
+    loaded = load_layout(path)
+    assert len(loaded) == 0 and loaded.connection_count() == 0 and loaded.names == []
+
+
+@pytest.mark.parametrize("use_mmap", [True, False])
+def test_truncated_files_are_rejected(tmp_path, layout, use_mmap):
+    path = tmp_path / "factory.fpl"
+    save_layout(path, layout)
+    data = path.read_bytes()
+    truncated = tmp_path / "truncated.fpl"
+    for size in range(len(data)):
+        truncated.write_bytes(data[:size])
+        try:
+            loaded = load_layout(truncated, use_mmap)
+        except ValueError:
+            continue
+        # Only the padding after the last column may be cut off
+        assert [loaded.connection(index) for index in range(loaded.connection_count())] == [layout.connection(index) for index in range(layout.connection_count())]
+
+
+def test_out_of_range_indexes_are_rejected(tmp_path, layout):
+    layout.end_buildings[1] = 7
+    path = tmp_path / "factory.fpl"
+    save_layout(path, layout)
+    with pytest.raises(ValueError):
+        load_layout(path)
@@ -0,0 +1,48 @@
+import pytest
+from classes.FlowSolver import FlowSolver
+from classes.LogisticsSimulation import LogisticsSimulation
+
+
+def manifold(miner_rate, belt_capacity, smelter=None):
+    # Miner -> (smelter ->) splitter -> two constructors taking 15/min each
+    flow = FlowSolver()
+    flow.add_node("miner", supply=miner_rate)
+    flow.add_node("splitter")
+    flow.add_node("a", capacity=15)
+    flow.add_node("b", capacity=15)
+    if smelter is None:
+        flow.add_edge("in", "miner", "splitter", belt_capacity)
+    else:
+        flow.add_node("smelter", capacity=smelter)
+        flow.add_edge("ore", "miner", "smelter", belt_capacity)
+        flow.add_edge("in", "smelter", "splitter", belt_capacity)
+    flow.add_edge("to_a", "splitter", "a", belt_capacity)
+    flow.add_edge("to_b", "splitter", "b", belt_capacity)
+    demands = {"a": 15, "b": 15, "smelter": smelter}
+    return flow, LogisticsSimulation.from_flow(flow, {"splitter": "Splitter"}, demands)
+
+
+def test_machine_fed_splitter_passes_on_what_the_machine_takes():
+    flow, simulation = manifold(60, 60, smelter=30)
+    flow.solve()
+    result = simulation.run()
+    assert result.steady
+    for edge in ("in", "to_a", "to_b"):
+        assert result.belt_rates[edge] == pytest.approx(flow.result.belt_flow[edge])
+    assert result.node_rates["splitter"] == pytest.approx(30)
+    assert result.blocked["miner"] == pytest.approx(30)
+
+
+def test_backed_up_belts_are_saturated():
+    _, simulation = manifold(120, 60)
+    result = simulation.run()
+    assert result.blocked == {"miner": pytest.approx(90)}
+    assert set(result.saturated_at) == {"in", "to_a", "to_b"}
+
+
+def test_even_split_without_back_pressure():
+    _, simulation = manifold(30, 60)
+    result = simulation.run()
+    assert result.split(["to_a", "to_b"]) == {"to_a": pytest.approx(0.5), "to_b": pytest.approx(0.5)}
+    assert not result.saturated_at
+    assert not result.blocked